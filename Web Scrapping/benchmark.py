@@ -0,0 +1,450 @@
+# Offline benchmark: serves synthetic directory pages generated from the site
+# specs on a local HTTP server and runs the scrapers against it in HTTP, async
+# and browser mode. Every scenario runs in its own process so peak RSS and
+# startup time are its own; results are appended to benchmarks/results.jsonl
+# (ignored by git) and compared with the previous run of the same scenario.
+#
+#   python benchmark.py                                 all sites, http + async
+#   python benchmark.py --sites yellowpages --modes http browser --captcha-every 3
+#   python benchmark.py --serve --sites yellowpages     just run the mock site
+import os
+import re
+import sys
+import json
+import html
+import time
+import random
+import argparse
+import platform
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote_plus, unquote_plus, urlparse
+from scrape import BrowserProfile, DetailEnricher, DomainRateLimiter, ScrapeJob, ScrapeScheduler, SiteScraper, Sink, available_sites, load_site_spec, run_metrics
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_PATH = os.path.join(BENCHMARK_DIR, "benchmarks", "results.jsonl")
+MODES = ["http", "async", "browser"]
+
+# Metrics compared between runs and whether a higher value is better
+COMPARED_METRICS = {
+    "pages_per_second": True,
+    "records_per_second": True,
+    "startup_seconds": False,
+    "peak_rss_mb": False,
+}
+
+SELECTOR_PART = re.compile(
+    r"(?P<tag>^[a-zA-Z][\w-]*)|\.(?P<cls>[\w-]+)|#(?P<id>[\w-]+)"
+    r"|\[(?P<attr>[\w-]+)(?:(?P<op>[\^$*~|]?=)['\"]?(?P<value>[^'\"\]]*)['\"]?)?\]"
+)
+
+def selector_elements(selector, default_tag="div"):
+    # (tag, attributes) for each element of the first alternative of a CSS
+    # selector, outermost first, e.g. ".company_website a" -> div.company_website > a.
+    # default_tag is used for the innermost element when the selector names no tag.
+    elements = []
+    compounds = selector.split(",")[0].split()
+    for position, compound in enumerate(compounds):
+        tag = default_tag if position == len(compounds) - 1 else "div"
+        classes = []
+        attributes = {}
+        for part in SELECTOR_PART.finditer(compound):
+            if part.group("tag"):
+                tag = part.group("tag")
+            elif part.group("cls"):
+                classes.append(part.group("cls"))
+            elif part.group("id"):
+                attributes["id"] = part.group("id")
+            elif part.group("attr"):
+                value = part.group("value") or ""
+                if part.group("op") == "$=":
+                    value = "https://schema.org/" + value
+                elif part.group("op") == "*=":
+                    value = "x" + value + "x"
+                attributes[part.group("attr")] = value
+        if classes:
+            attributes["class"] = " ".join(classes)
+        elements.append((tag, attributes))
+    return elements
+
+def render(selector, inner="", default_tag="div", **extra_attributes):
+    elements = selector_elements(selector, default_tag)
+    elements[-1][1].update(extra_attributes)
+    markup = inner
+    for tag, attributes in reversed(elements):
+        attrs = "".join(f' {name}="{html.escape(value)}"' for name, value in attributes.items())
+        markup = f"<{tag}{attrs}>{markup}</{tag}>"
+    return markup
+
+def render_field(field, selector, value):
+    leaf_attributes = selector_elements(selector)[-1][1]
+    source = field.get("source", "text")
+    extra = {}
+    if "href" in leaf_attributes and selector.split(",")[0].find("href^=") != -1:
+        # a[href^='tel:'] and friends: the prefix from the selector plus the value
+        extra["href"] = leaf_attributes["href"] + value
+    if source == "text":
+        return render(selector, html.escape(value), "span", **extra)
+    extra.setdefault(source, (field.get("strip_prefix") or "") + value)
+    return render(selector, html.escape(field["column"]), "a", **extra)
+
+def synthetic_listing(term, page, index):
+    rng = random.Random(f"{term}/{page}/{index}")
+    number = (page - 1) * 1000 + index
+    slug = f"{re.sub(r'[^a-z0-9]+', '', term.lower())}{number}"
+    return {
+        "Name": f"{term.title()} {rng.choice(['Trading', 'Services', 'Holdings', 'Enterprise'])} {number} Pte Ltd",
+        "Address": f"{rng.randint(1, 999)} {rng.choice(['Ang Mo Kio', 'Bedok', 'Jurong', 'Tampines'])} Avenue {rng.randint(1, 12)}, Singapore {rng.randint(100000, 829999)}",
+        "Phone": f"6{rng.randint(100, 999)} {rng.randint(1000, 9999)}",
+        "Website": f"https://www.{slug}.com.sg/",
+        "Email": f"sales@{slug}.com.sg",
+        "Detail URL": f"/detail/{page}/{index}/{quote_plus(term)}",
+    }
+
+class MockDirectoryServer:
+    # A local directory site rendered from a SiteSpec: the base URL serves a search
+    # form, any other query returns pages of listings linked by next-page links.
+    # Listings rotate through every fallback selector of each field. With
+    # captcha_every=N every Nth results page answers with a CAPTCHA the first time
+    # it is requested; the cookie notice is shown until its close button is clicked.
+    # With detail_pages, every other listing leaves the spec's detail fields empty
+    # and they are served on the listing's detail page instead.
+    def __init__(self, spec, pages=10, listings=20, latency=0.0, captcha_every=0, cookie_notice=True, port=0, detail_pages=False):
+        self.spec = spec
+        self.detail_pages = detail_pages and bool(spec.detail_link_column)
+        self.pages = pages
+        self.listings = listings
+        self.latency = latency
+        self.captcha_every = captcha_every
+        self.cookie_notice = cookie_notice and bool(spec.cookie_notice)
+        self.seen = set()
+        self.lock = threading.Lock()
+        self.requests = 0
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; Nagle would delay the body
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                server.handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}/"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def handle(self, request):
+        with self.lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        location = urlparse(request.path)
+        query = parse_qs(location.query)
+        page = int(query.pop("page", ["1"])[0])
+        terms = [values[0] for values in query.values()]
+        cookies_accepted = "cookies_accepted=1" in (request.headers.get("Cookie") or "")
+
+        if location.path.startswith("/detail/"):
+            detail_page, index, term = location.path.split("/", 4)[2:]
+            body = self.detail_page(unquote_plus(term), int(detail_page), int(index))
+        elif not terms:
+            body = self.search_page(cookies_accepted)
+        elif self.captcha_every and page % self.captcha_every == 0 and self.first_visit(request.path):
+            body = self.captcha_page()
+        else:
+            param = next(iter(query))
+            body = self.results_page(param, terms[0], page, cookies_accepted)
+
+        payload = body.encode("utf-8")
+        request.send_response(200)
+        request.send_header("Content-Type", "text/html; charset=utf-8")
+        request.send_header("Content-Length", str(len(payload)))
+        request.end_headers()
+        request.wfile.write(payload)
+
+    def first_visit(self, path):
+        with self.lock:
+            if path in self.seen:
+                return False
+            self.seen.add(path)
+            return True
+
+    def document(self, body, cookies_accepted=True):
+        notice = ""
+        if self.cookie_notice and not cookies_accepted:
+            # Hides the outermost element of the notice and remembers the choice
+            close = ("document.cookie='cookies_accepted=1';var e=this;"
+                     "while(e.parentNode!==document.body)e=e.parentNode;e.style.display='none'")
+            notice = render(self.spec.cookie_notice, "Accept", "button", onclick=close)
+        return (
+            f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>{html.escape(self.spec.label)}</title></head>"
+            f"<body>{notice}{body}</body></html>"
+        )
+
+    def search_page(self, cookies_accepted):
+        name = self.spec.search_input or "q"
+        return self.document(f'<form method="get"><input type="text" name="{html.escape(name)}"><button type="submit">Search</button></form>', cookies_accepted)
+
+    def captcha_page(self):
+        return self.document(render(self.spec.captcha or ".captcha", "Please verify that you are human."))
+
+    def detail_page(self, term, page, index):
+        values = synthetic_listing(term, page, index)
+        fields = "".join(
+            render_field(field, field["selectors"][index % len(field["selectors"])], values.get(field["column"], ""))
+            for field in self.spec.config["detail"]["fields"]
+        )
+        return self.document(f"<h1>{html.escape(values['Name'])}</h1><section>{fields}</section>")
+
+    def results_page(self, param, term, page, cookies_accepted):
+        detail_columns = {field.column for field in self.spec.detail_fields} if self.detail_pages else set()
+        listings = []
+        for index in range(self.listings):
+            values = synthetic_listing(term, page, index)
+            if index % 2:
+                values = {column: value for column, value in values.items() if column not in detail_columns}
+            fields = "".join(
+                render_field(field, field["selectors"][index % len(field["selectors"])], values[field["column"]])
+                for field in self.spec.config["fields"]
+                if field["column"] in values
+            )
+            listings.append(render(self.spec.listing, fields))
+        pager = ""
+        if page < self.pages:
+            pager = render(self.spec.next_page, "Next", "a", href=f"?{param}={quote_plus(term)}&page={page + 1}")
+        return self.document(f"<main>{''.join(listings)}</main><nav>{pager}</nav>", cookies_accepted)
+
+class NullSink(Sink):
+    # Counts records without keeping or writing them, so only scraping is measured
+    def __init__(self):
+        self.count = 0
+
+    def write(self, records):
+        self.count += len(records)
+
+def peak_rss_mb(children=False):
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+def run_scenario(scenario):
+    # Runs in the child process; launched_at is the parent's clock when it spawned us
+    ready_seconds = time.time() - scenario["launched_at"]
+    run_metrics.reset()
+    spec = load_site_spec(scenario["site"])
+    jobs = [ScrapeJob(f"benchmark {n}", scenario["pages"]) for n in range(scenario["terms"])]
+    rate_limiter = DomainRateLimiter(rate=scenario["rate"], capacity=max(scenario["rate"], 1), concurrency=scenario["workers"])
+    browser_profile = BrowserProfile() if scenario["browser_profile"] == "lean" else BrowserProfile.full()
+    first_batch = []
+
+    def progress(job, batch):
+        if not first_batch:
+            first_batch.append(time.time())
+
+    sink = NullSink()
+    enricher = None
+    if scenario["enrich"] and spec.detail_link_column:
+        detail_rate_limiter = DomainRateLimiter(rate=scenario["rate"], capacity=max(scenario["rate"], 1), concurrency=scenario["workers"])
+        enricher = DetailEnricher(spec, scenario["workers"] * 2, detail_rate_limiter)
+    started = time.perf_counter()
+    try:
+        if scenario["mode"] == "async":
+            from crawler import AsyncCrawler
+
+            crawler = AsyncCrawler(spec, scenario["url"], scenario["workers"], scenario["workers"], rate_limiter=rate_limiter)
+            crawler.run(jobs, sink, progress=progress, enricher=enricher)
+        else:
+            def make_scraper():
+                return SiteScraper(
+                    spec=spec, url=scenario["url"], http_mode=scenario["mode"] == "http",
+                    rate_limiter=rate_limiter, captcha_handler=lambda: None, browser_profile=browser_profile,
+                )
+
+            ScrapeScheduler(make_scraper, scenario["workers"], progress=progress, enricher=enricher).run(jobs, sink)
+    finally:
+        if enricher is not None:
+            enricher.close()
+    elapsed = time.perf_counter() - started
+
+    report = run_metrics.report()
+    return {
+        "pages": report["pages"],
+        "records": sink.count,
+        "expected_records": scenario["terms"] * scenario["pages"] * scenario["listings"],
+        "elapsed_seconds": elapsed,
+        "pages_per_second": report["pages"] / elapsed if elapsed else 0.0,
+        "records_per_second": sink.count / elapsed if elapsed else 0.0,
+        "ready_seconds": ready_seconds,
+        "startup_seconds": first_batch[0] - scenario["launched_at"] if first_batch else None,
+        "peak_rss_mb": peak_rss_mb(),
+        # Largest single child: Chrome/chromedriver or a parser process
+        "peak_child_rss_mb": peak_rss_mb(children=True),
+        "counters": report["counters"],
+        "phases": {name: stats["total_seconds"] for name, stats in report["phases"].items()},
+    }
+
+def spawn_scenario(scenario):
+    scenario = dict(scenario, launched_at=time.time())
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--run-scenario", json.dumps(scenario)],
+        cwd=BENCHMARK_DIR, capture_output=True, text=True,
+    )
+    lines = result.stdout.strip().splitlines()
+    if result.returncode != 0 or not lines:
+        error = (result.stderr.strip().splitlines() or ["exit status %d" % result.returncode])[-1]
+        return None, error
+    return json.loads(lines[-1]), None
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARK_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=BENCHMARK_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("-dirty" if dirty else "")
+
+def load_results(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def previous_result(history, entry):
+    for previous in reversed(history):
+        if previous["scenario"] == entry["scenario"] and previous["settings"] == entry["settings"]:
+            return previous
+    return None
+
+def regressions(previous, entry, threshold):
+    found = []
+    for metric, higher_is_better in COMPARED_METRICS.items():
+        old, new = previous["metrics"].get(metric), entry["metrics"].get(metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        if (change < -threshold) if higher_is_better else (change > threshold):
+            found.append(f"{metric} {old:.2f} -> {new:.2f} ({change:+.0%})")
+    return found
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python benchmark.py",
+        description="Benchmark the scrapers against a local mock directory site.",
+    )
+    parser.add_argument("--sites", nargs="+", default=available_sites(), help="site specs to benchmark (default: all)")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=["http", "async"], help="scraping modes (browser needs Chrome)")
+    parser.add_argument("--terms", type=int, default=4, help="search terms per scenario")
+    parser.add_argument("--pages", type=int, default=10, help="results pages per search term")
+    parser.add_argument("--listings", type=int, default=20, help="listings per results page")
+    parser.add_argument("--workers", type=int, default=2, help="scheduler workers, or async concurrency")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds the mock site waits before answering")
+    parser.add_argument("--captcha-every", type=int, default=0, help="serve a CAPTCHA first on every Nth results page")
+    parser.add_argument("--browser-profile", choices=["lean", "full"], default="lean", help="Chrome profile for browser scenarios")
+    parser.add_argument("--enrich", action="store_true", help="also fetch detail pages for sites that have them")
+    parser.add_argument("--rate", type=float, default=1000.0, help="requests per second per domain allowed to the scrapers")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per scenario")
+    parser.add_argument("--results", default=RESULTS_PATH, help="JSON Lines file the results are appended to")
+    parser.add_argument("--no-save", action="store_true", help="compare with earlier results without recording this run")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change reported as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 if anything regressed")
+    parser.add_argument("--serve", action="store_true", help="serve the mock site for the first --sites entry until interrupted")
+    parser.add_argument("--port", type=int, default=0, help="port for --serve")
+    parser.add_argument("--run-scenario", help=argparse.SUPPRESS)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.run_scenario:
+        print(json.dumps(run_scenario(json.loads(args.run_scenario))))
+        return 0
+
+    if args.serve:
+        spec = load_site_spec(args.sites[0])
+        server = MockDirectoryServer(spec, args.pages, args.listings, args.latency, args.captcha_every, port=args.port, detail_pages=args.enrich)
+        print(f"Serving a mock {spec.label} at {server.url} (Ctrl+C to stop)", file=sys.stderr)
+        try:
+            server.httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.httpd.server_close()
+        return 0
+
+    settings = {name: getattr(args, name) for name in ("terms", "pages", "listings", "workers", "latency", "captcha_every", "rate", "browser_profile", "enrich")}
+    history = load_results(args.results)
+    commit = git_commit()
+    entries = []
+    regressed = False
+
+    for site in args.sites:
+        spec = load_site_spec(site)
+        for mode in args.modes:
+            for _ in range(args.repeat):
+                # A fresh server per run so CAPTCHAs and cookies start over
+                with MockDirectoryServer(spec, args.pages, args.listings, args.latency, args.captcha_every, detail_pages=args.enrich) as server:
+                    metrics, error = spawn_scenario(dict(settings, site=site, mode=mode, url=server.url))
+                name = f"{site}/{mode}"
+                if error is not None:
+                    print(f"{name:40} skipped: {error}", file=sys.stderr)
+                    continue
+                entry = {
+                    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                    "commit": commit,
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "scenario": name,
+                    "settings": settings,
+                    "metrics": metrics,
+                }
+                startup = f"{metrics['startup_seconds']:.2f}s" if metrics["startup_seconds"] is not None else "-"
+                print(
+                    f"{name:40} {metrics['pages_per_second']:8.1f} pages/s {metrics['records_per_second']:9.1f} records/s "
+                    f"startup {startup:>7} peak RSS {metrics['peak_rss_mb'] or 0:6.1f} MB"
+                    + ("" if metrics["records"] == metrics["expected_records"] else f"  ({metrics['records']}/{metrics['expected_records']} records)")
+                )
+                previous = previous_result(history, entry)
+                if previous is not None:
+                    for regression in regressions(previous, entry, args.threshold):
+                        regressed = True
+                        print(f"{'':40} REGRESSION since {previous['commit'] or previous['timestamp']}: {regression}")
+                entries.append(entry)
+
+    if entries and not args.no_save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.results)), exist_ok=True)
+        with open(args.results, "a", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+        print(f"Appended {len(entries)} results to {args.results}", file=sys.stderr)
+    return 1 if regressed and args.fail_on_regression else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+import shutil
+import tempfile
+from contextlib import contextmanager
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, StaleElementReferenceException
+from fake_useragent import UserAgent
+
+# Cheap fingerprint of the rendered listing set, used to notice in-place (AJAX) pagination
+LISTING_SIGNATURE_SCRIPT = """
+var listings = document.querySelectorAll(arguments[0]);
+if (!listings.length) { return ""; }
+return listings.length + "|" + listings[0].textContent + "|" + listings[listings.length - 1].textContent;
+"""
+
+class listing_set_changed:
+    # Expected condition that holds as soon as the results shown differ from the
+    # ones captured before navigating: either the old first listing was detached
+    # (full page load) or the listing signature changed (in-place update).
+    def __init__(self, listing_selector, previous_listing, previous_signature):
+        self.listing_selector = listing_selector
+        self.previous_listing = previous_listing
+        self.previous_signature = previous_signature
+
+    def __call__(self, driver):
+        if self.previous_listing is not None:
+            try:
+                self.previous_listing.is_enabled()
+            except StaleElementReferenceException:
+                self.previous_listing = None
+        signature = driver.execute_script(LISTING_SIGNATURE_SCRIPT, self.listing_selector)
+        if not signature:
+            return False
+        return self.previous_listing is None or signature != self.previous_signature
+
+def wait_for(driver, condition, timeout=10):
+    return WebDriverWait(driver, timeout, poll_frequency=0.1).until(condition)
+
+def create_chrome_driver(headless_mode, profile=None):
+    # profile is a scrape.BrowserProfile; without one Chrome starts with its full
+    # default settings (images, fonts, trackers, maximized window, shared cache)
+    chrome_options = Options()
+    chrome_options.add_argument("--disable-popup-blocking")
+    cache_dir = None
+
+    if profile is None:
+        chrome_options.add_argument("--start-maximized")
+    else:
+        chrome_options.page_load_strategy = profile.page_load_strategy
+        if profile.window_size:
+            chrome_options.add_argument("--window-size=%d,%d" % profile.window_size)
+        else:
+            chrome_options.add_argument("--start-maximized")
+        # Only without a window: a visible browser may have to show an image CAPTCHA to a person
+        if not profile.images and headless_mode:
+            chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+            chrome_options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+        if profile.cache_size:
+            cache_dir = tempfile.mkdtemp(prefix="scrape-chrome-cache-")
+            chrome_options.add_argument(f"--disk-cache-dir={cache_dir}")
+            chrome_options.add_argument(f"--disk-cache-size={profile.cache_size}")
+        for argument in profile.arguments:
+            chrome_options.add_argument(argument)
+
+    if headless_mode:
+        chrome_options.add_argument("--headless")
+        chrome_options.add_argument("--disable-gpu")
+
+    user_agent = UserAgent().random
+    chrome_options.add_argument(f"user-agent={user_agent}")
+
+    try:
+        driver = webdriver.Chrome(options=chrome_options)
+    except Exception:
+        if cache_dir:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+        raise
+    driver.scrape_cache_dir = cache_dir
+    driver.scrape_blocked_urls = profile.blocked_urls() if profile is not None else []
+    if driver.scrape_blocked_urls:
+        block_urls(driver, driver.scrape_blocked_urls)
+    return driver
+
+def block_urls(driver, patterns):
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(patterns)})
+
+@contextmanager
+def blocking_lifted(driver):
+    # Loads everything again while a person solves a CAPTCHA in the window
+    patterns = getattr(driver, "scrape_blocked_urls", None)
+    if patterns:
+        block_urls(driver, [])
+    try:
+        yield
+    finally:
+        if patterns:
+            block_urls(driver, patterns)
+
+def quit_chrome_driver(driver):
+    try:
+        driver.quit()
+    finally:
+        cache_dir = getattr(driver, "scrape_cache_dir", None)
+        if cache_dir:
+            shutil.rmtree(cache_dir, ignore_errors=True)
@@ -0,0 +1,223 @@
+# Asyncio crawl engine for the HTTP path: many search terms are paginated
+# concurrently over one aiohttp session, page parsing runs in a process pool and
+# a bounded queue between the two applies backpressure to the fetchers. Sink
+# writes, dedup lookups and checkpoints run on one writer thread, so the event
+# loop never blocks on disk.
+import os
+import time
+import random
+import asyncio
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import urlparse
+import aiohttp
+from scrape import BatchPublisher, BrowserRequired, PageBatch, SiteSpec, default_rate_limiter, run_metrics
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Set in each parser process by init_parser
+parser_spec = None
+
+def init_parser(spec_config):
+    global parser_spec
+    parser_spec = SiteSpec(spec_config)
+
+def parse_page(html, url):
+    # Runs in a parser process and returns (records, next_url, selector stats, seconds
+    # spent); records is None for pages that need a browser
+    start = time.perf_counter()
+    stats = Counter()
+    document = parser_spec.extractor.parse(html, url)
+    if parser_spec.needs_browser(document):
+        return None, None, stats, time.perf_counter() - start
+    records = parser_spec.extractor.extract_document(document, stats)
+    return records, parser_spec.next_link(document)[1], stats, time.perf_counter() - start
+
+class RetryableStatus(Exception):
+    def __init__(self, status, retry_after=None):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+class AsyncTokenBucket:
+    # scrape.TokenBucket for the event loop: acquire() sleeps as a coroutine, and
+    # waiters are served in arrival order
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class AsyncCrawler:
+    # concurrency bounds how many search terms are paginated at once, per_host how
+    # many requests may be in flight to one host, and queue_size how many fetched
+    # pages may wait for a parser before fetchers are held back. rate_limiter is a
+    # scrape.DomainRateLimiter whose per-domain PolitenessPolicy (rate, burst,
+    # jitter, and concurrency as a cap on per_host) the crawler enforces with its
+    # own async token buckets.
+    def __init__(self, spec, url=None, concurrency=16, per_host=4, parse_workers=None, queue_size=32,
+                 retries=4, backoff=0.5, timeout=30, user_agent=None, rate_limiter=None):
+        self.spec = spec
+        self.url = url or spec.base_url
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.rate_limiter = rate_limiter or default_rate_limiter
+        self.parse_workers = parse_workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self.host_semaphores = {}
+        self.host_buckets = {}
+        self.pool = None
+        self.parse_queue = None
+
+    def site_key(self):
+        return urlparse(self.url).netloc
+
+    async def throttle(self, host):
+        policy = self.rate_limiter.policy(host)
+        if host not in self.host_buckets:
+            self.host_buckets[host] = AsyncTokenBucket(policy.rate, policy.capacity)
+        with run_metrics.phase("rate_limit"):
+            await self.host_buckets[host].acquire()
+            if policy.jitter:
+                await asyncio.sleep(random.uniform(0, policy.jitter))
+
+    async def fetch(self, session, url):
+        host = urlparse(url).netloc
+        if host not in self.host_semaphores:
+            self.host_semaphores[host] = asyncio.Semaphore(min(self.per_host, self.rate_limiter.policy(host).concurrency))
+        semaphore = self.host_semaphores[host]
+
+        for attempt in range(self.retries + 1):
+            try:
+                async with semaphore:
+                    await self.throttle(host)
+                    with run_metrics.phase("fetch"):
+                        run_metrics.count("requests")
+                        async with session.get(url) as response:
+                            if response.status in RETRY_STATUSES:
+                                raise RetryableStatus(response.status, response.headers.get("Retry-After"))
+                            response.raise_for_status()
+                            return str(response.url), await response.text()
+            except (RetryableStatus, aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as e:
+                if attempt == self.retries:
+                    raise
+                run_metrics.count("retries")
+                delay = self.backoff * 2 ** attempt * random.uniform(1, 1.5)
+                if isinstance(e, RetryableStatus) and e.retry_after and e.retry_after.isdigit():
+                    delay = max(delay, float(e.retry_after))
+                await asyncio.sleep(delay)
+
+    async def parse_worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            html, url, future = await self.parse_queue.get()
+            try:
+                future.set_result(await loop.run_in_executor(self.pool, parse_page, html, url))
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                self.parse_queue.task_done()
+
+    async def parse(self, html, url):
+        future = asyncio.get_running_loop().create_future()
+        # Blocks while the parsers are behind, so fetched pages cannot pile up in memory
+        await self.parse_queue.put((html, url, future))
+        return await future
+
+    async def crawl(self, session, job, emit, stop_event, resume_from=None):
+        start_page, url, page_count = self.spec.start_position(self.url, job.search_term, job.start_page, resume_from)
+        url = url or self.spec.build_search_url(self.url, job.search_term)
+
+        while page_count < job.max_pages and not (stop_event and stop_event.is_set()):
+            page_started = time.perf_counter()
+            final_url, html = await self.fetch(session, url)
+            with run_metrics.phase("parse_queue"):
+                records, next_url, stats, parse_seconds = await self.parse(html, final_url)
+            run_metrics.observe("extract", parse_seconds)
+            run_metrics.record_selectors(stats)
+            if records is None:
+                run_metrics.count("browser_required")
+                raise BrowserRequired(url, page_count)
+
+            page_count += 1
+            if page_count >= start_page:
+                await emit(job, PageBatch(page_count, url, records, bool(next_url), next_url))
+                run_metrics.observe("page", time.perf_counter() - page_started)
+            if not next_url:
+                break
+            url = next_url
+
+    async def run_async(self, jobs, sink, checkpoints, resume, stop_event, progress, deduplicator, enricher):
+        loop = asyncio.get_running_loop()
+        # Buckets hold asyncio locks, which belong to this run's event loop
+        self.host_buckets = {}
+        self.host_semaphores = {}
+        self.parse_queue = asyncio.Queue(self.queue_size)
+        parsers = [asyncio.create_task(self.parse_worker()) for _ in range(self.parse_workers)]
+        term_slots = asyncio.Semaphore(self.concurrency)
+        site = self.site_key()
+        publisher = BatchPublisher(sink, checkpoints, resume, progress, deduplicator, enricher)
+        errors = []
+
+        # One thread, so batches reach the sink one at a time and in order
+        writer = ThreadPoolExecutor(1, thread_name_prefix="sink")
+
+        async def emit(job, batch):
+            await loop.run_in_executor(writer, publisher.deliver, job, batch)
+
+        async def run_job(session, job):
+            checkpoint = await loop.run_in_executor(writer, publisher.resume_point, site, job)
+            if publisher.already_done(job, checkpoint):
+                return
+            async with term_slots:
+                try:
+                    await self.crawl(session, job, emit, stop_event, checkpoint)
+                except Exception as e:
+                    errors.append((job, e))
+
+        headers = {"User-Agent": self.user_agent} if self.user_agent else {}
+        if not headers:
+            from fake_useragent import UserAgent
+
+            headers["User-Agent"] = UserAgent().random
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host)
+        try:
+            async with aiohttp.ClientSession(headers=headers, connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
+                await asyncio.gather(*(run_job(session, job) for job in jobs))
+            await loop.run_in_executor(None, publisher.join)
+        finally:
+            for parser in parsers:
+                parser.cancel()
+            await asyncio.gather(*parsers, return_exceptions=True)
+            writer.shutdown()
+
+        if errors:
+            job, error = errors[0]
+            raise RuntimeError(f"Scraping '{job.search_term}' failed: {error}") from error
+        return publisher.finished(jobs)
+
+    # Same contract as ScrapeScheduler.run
+    def run(self, jobs, sink, checkpoints=None, resume=False, stop_event=None, progress=None, deduplicator=None, enricher=None):
+        jobs = list(jobs)
+        with ProcessPoolExecutor(self.parse_workers, initializer=init_parser, initargs=(self.spec.config,)) as pool:
+            self.pool = pool
+            try:
+                return asyncio.run(self.run_async(jobs, sink, checkpoints, resume, stop_event, progress, deduplicator, enricher))
+            finally:
+                self.pool = None
@@ -0,0 +1,542 @@
+# Distributed crawl: a coordinator puts search-term x page-range jobs on a shared
+# queue, workers on any number of machines lease them, scrape them with the
+# site scrapers and write one partition file per job, and a merge step
+# consolidates the partitions of finished jobs into one output.
+#
+# Leases expire unless the worker holding them sends heartbeats, so the jobs of a
+# dead worker go back on the queue (up to --max-attempts times). A partition is
+# only published once its job completes under a valid lease, so retried jobs
+# never produce duplicate rows.
+#
+#   python distributed.py submit --queue crawl.sqlite3 --site yellowpages --max-pages 50 --pages-per-job 10 cafe bakery
+#   python distributed.py work --queue crawl.sqlite3 --output-dir parts --processes 4
+#   python distributed.py status --queue crawl.sqlite3
+#   python distributed.py merge --queue crawl.sqlite3 --output-dir parts --output listings.csv --dedup
+#
+# --queue is a SQLite file (one machine, or several sharing a local disk) or a
+# redis:// URL; the redis package is only imported for Redis queues.
+import os
+import sys
+import json
+import time
+import socket
+import sqlite3
+import argparse
+import threading
+import multiprocessing
+from contextlib import closing, contextmanager
+from scrape import (
+    BrowserProfile,
+    BrowserWorker,
+    Deduplicator,
+    DomainRateLimiter,
+    JsonLinesSink,
+    PageCache,
+    ScrapeJob,
+    SiteScraper,
+    load_site_spec,
+    load_spec_file,
+    open_sink,
+    read_terms,
+    run_metrics,
+)
+
+class Task:
+    # One leased job. attempt tells apart successive leases of the same job, so a
+    # worker whose lease expired cannot complete the job after it was handed on.
+    def __init__(self, task_id, payload, attempt, worker):
+        self.id = task_id
+        self.payload = payload
+        self.attempt = attempt
+        self.worker = worker
+
+class SqliteWorkQueue:
+    # Work queue in an SQLite file; every lease, heartbeat and completion is one
+    # IMMEDIATE transaction, so any number of worker processes can share it.
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL, state TEXT NOT NULL DEFAULT 'pending', "
+            "worker TEXT, attempts INTEGER NOT NULL DEFAULT 0, lease_expires REAL, result TEXT, error TEXT, "
+            "updated_at REAL NOT NULL)"
+        )
+
+    @contextmanager
+    def transaction(self):
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+            self.connection.execute("COMMIT")
+
+    def put(self, payloads):
+        now = time.time()
+        with self.transaction():
+            self.connection.executemany(
+                "INSERT INTO tasks (payload, updated_at) VALUES (?, ?)",
+                [(json.dumps(payload), now) for payload in payloads],
+            )
+
+    def lease(self, worker, seconds, max_attempts):
+        with self.transaction():
+            now = time.time()
+            self.connection.execute(
+                "UPDATE tasks SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "error = 'lease of ' || worker || ' expired', worker = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE state = 'leased' AND lease_expires < ?",
+                (max_attempts, now, now),
+            )
+            row = self.connection.execute(
+                "SELECT id, payload, attempts FROM tasks WHERE state = 'pending' ORDER BY id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            self.connection.execute(
+                "UPDATE tasks SET state = 'leased', worker = ?, attempts = attempts + 1, lease_expires = ?, updated_at = ? WHERE id = ?",
+                (worker, now + seconds, now, row[0]),
+            )
+        return Task(row[0], json.loads(row[1]), row[2] + 1, worker)
+
+    def update_owned(self, task, assignments, values):
+        # Applies the update only while the task is still leased to this attempt
+        with self.transaction():
+            cursor = self.connection.execute(
+                f"UPDATE tasks SET {assignments}, updated_at = ? WHERE id = ? AND state = 'leased' AND worker = ? AND attempts = ?",
+                (*values, time.time(), task.id, task.worker, task.attempt),
+            )
+        return cursor.rowcount == 1
+
+    def heartbeat(self, task, seconds):
+        return self.update_owned(task, "lease_expires = ?", (time.time() + seconds,))
+
+    def complete(self, task, result):
+        return self.update_owned(task, "state = 'done', result = ?, lease_expires = NULL", (result,))
+
+    def fail(self, task, error, max_attempts):
+        state = "failed" if task.attempt >= max_attempts else "pending"
+        return self.update_owned(task, "state = ?, error = ?, worker = NULL, lease_expires = NULL", (state, error))
+
+    def stats(self):
+        with self.lock:
+            rows = self.connection.execute("SELECT state, COUNT(*) FROM tasks GROUP BY state").fetchall()
+        return {"pending": 0, "leased": 0, "done": 0, "failed": 0, **dict(rows)}
+
+    def failures(self):
+        with self.lock:
+            return self.connection.execute("SELECT id, error FROM tasks WHERE state = 'failed' ORDER BY id").fetchall()
+
+    def results(self):
+        with self.lock:
+            return self.connection.execute("SELECT id, result FROM tasks WHERE state = 'done' ORDER BY id").fetchall()
+
+    def close(self):
+        self.connection.close()
+
+class RedisWorkQueue:
+    # The same queue on Redis (or anything speaking its protocol). State changes
+    # run as WATCH/MULTI transactions rather than Lua scripts, and lease expiry
+    # uses the server's clock, so workers' clocks do not need to agree.
+    def __init__(self, url, name="scrape"):
+        import redis
+
+        self.WatchError = redis.WatchError
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self.keys = {key: f"{name}:{key}" for key in ("next_id", "payloads", "pending", "leases", "owners", "attempts", "done", "failed", "errors")}
+
+    def now(self):
+        seconds, microseconds = self.redis.time()
+        return seconds + microseconds / 1e6
+
+    def transact(self, watched, build):
+        # build(pipe) reads through the watching pipeline and either queues the
+        # writes after pipe.multi() and returns a result, or returns None untouched
+        with self.redis.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(*(self.keys[key] for key in watched))
+                    result = build(pipe)
+                    if result is not None:
+                        pipe.execute()
+                    return result
+                except self.WatchError:
+                    continue
+                finally:
+                    pipe.reset()
+
+    def put(self, payloads):
+        keys = self.keys
+        for payload in payloads:
+            task_id = self.redis.incr(keys["next_id"])
+            with self.redis.pipeline() as pipe:
+                pipe.hset(keys["payloads"], task_id, json.dumps(payload))
+                pipe.zadd(keys["pending"], {task_id: task_id})
+                pipe.execute()
+
+    def requeue_expired(self, max_attempts):
+        keys = self.keys
+        now = self.now()
+
+        def build(pipe):
+            expired = pipe.zrangebyscore(keys["leases"], 0, now)
+            if not expired:
+                return None
+            owners = pipe.hmget(keys["owners"], expired)
+            attempts = pipe.hmget(keys["attempts"], expired)
+            pipe.multi()
+            pipe.zrem(keys["leases"], *expired)
+            pipe.hdel(keys["owners"], *expired)
+            for task_id, owner, attempt in zip(expired, owners, attempts):
+                error = f"lease of {(owner or '').rsplit('#', 1)[0]} expired"
+                pipe.hset(keys["errors"], task_id, error)
+                if int(attempt or 0) >= max_attempts:
+                    pipe.hset(keys["failed"], task_id, error)
+                else:
+                    pipe.zadd(keys["pending"], {task_id: int(task_id)})
+            return expired
+
+        self.transact(["leases"], build)
+
+    def lease(self, worker, seconds, max_attempts):
+        self.requeue_expired(max_attempts)
+        keys = self.keys
+        expires = self.now() + seconds
+
+        def build(pipe):
+            first = pipe.zrange(keys["pending"], 0, 0)
+            if not first:
+                return None
+            task_id = first[0]
+            attempt = int(pipe.hget(keys["attempts"], task_id) or 0) + 1
+            payload = pipe.hget(keys["payloads"], task_id)
+            pipe.multi()
+            pipe.zrem(keys["pending"], task_id)
+            pipe.zadd(keys["leases"], {task_id: expires})
+            pipe.hset(keys["attempts"], task_id, attempt)
+            pipe.hset(keys["owners"], task_id, f"{worker}#{attempt}")
+            return Task(int(task_id), json.loads(payload), attempt, worker)
+
+        return self.transact(["pending"], build)
+
+    def update_owned(self, task, writes):
+        keys = self.keys
+
+        def build(pipe):
+            if pipe.hget(keys["owners"], task.id) != f"{task.worker}#{task.attempt}":
+                return False
+            pipe.multi()
+            writes(pipe)
+            return True
+
+        return bool(self.transact(["owners"], build))
+
+    def heartbeat(self, task, seconds):
+        expires = self.now() + seconds
+        return self.update_owned(task, lambda pipe: pipe.zadd(self.keys["leases"], {task.id: expires}, xx=True))
+
+    def release(self, pipe, task):
+        pipe.zrem(self.keys["leases"], task.id)
+        pipe.hdel(self.keys["owners"], task.id)
+
+    def complete(self, task, result):
+        def writes(pipe):
+            self.release(pipe, task)
+            pipe.hset(self.keys["done"], task.id, result)
+
+        return self.update_owned(task, writes)
+
+    def fail(self, task, error, max_attempts):
+        def writes(pipe):
+            self.release(pipe, task)
+            pipe.hset(self.keys["errors"], task.id, error)
+            if task.attempt >= max_attempts:
+                pipe.hset(self.keys["failed"], task.id, error)
+            else:
+                pipe.zadd(self.keys["pending"], {task.id: task.id})
+
+        return self.update_owned(task, writes)
+
+    def stats(self):
+        keys = self.keys
+        with self.redis.pipeline() as pipe:
+            pipe.zcard(keys["pending"])
+            pipe.zcard(keys["leases"])
+            pipe.hlen(keys["done"])
+            pipe.hlen(keys["failed"])
+            pending, leased, done, failed = pipe.execute()
+        return {"pending": pending, "leased": leased, "done": done, "failed": failed}
+
+    def failures(self):
+        return sorted((int(task_id), error) for task_id, error in self.redis.hgetall(self.keys["failed"]).items())
+
+    def results(self):
+        return sorted((int(task_id), result) for task_id, result in self.redis.hgetall(self.keys["done"]).items())
+
+    def close(self):
+        self.redis.close()
+
+def open_queue(location, name="scrape"):
+    if location.startswith(("redis://", "rediss://", "unix://")):
+        return RedisWorkQueue(location, name)
+    return SqliteWorkQueue(location[len("sqlite:///"):] if location.startswith("sqlite:///") else location)
+
+def load_spec(site):
+    return load_spec_file(site) if os.path.isfile(site) else load_site_spec(site)
+
+def job_payloads(site, terms, max_pages, pages_per_job=None, base_url=None):
+    # Page ranges of one term are separate jobs. A job starting past page 1 goes
+    # straight to its first page when the site spec has a page_url template, and
+    # otherwise walks the earlier pages to find it (extracting only its range)
+    payloads = []
+    for term in terms:
+        starts = range(1, max_pages + 1, pages_per_job) if pages_per_job else [1]
+        for start in starts:
+            last = min(start + pages_per_job - 1, max_pages) if pages_per_job else max_pages
+            payloads.append({"site": site, "base_url": base_url, "term": term, "start_page": start, "max_pages": last})
+    return payloads
+
+class QueueWorker:
+    # Leases jobs until the queue is finished. Keeps one scraper (and at most one
+    # Chrome) per site for all the jobs it runs; a heartbeat thread extends the
+    # lease of the running job and stops it if the lease was lost.
+    def __init__(self, queue, output_dir, scraper_options, headless_mode=True, lease_seconds=120,
+                 heartbeat_seconds=30, max_attempts=3, poll_seconds=2.0, worker_id=None):
+        self.queue = queue
+        self.output_dir = output_dir
+        self.scraper_options = scraper_options
+        self.headless_mode = headless_mode
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.max_attempts = max_attempts
+        self.poll_seconds = poll_seconds
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.browser_workers = {}
+
+    def browser_worker(self, payload):
+        key = (payload["site"], payload.get("base_url"))
+        if key not in self.browser_workers:
+            scraper = SiteScraper(spec=load_spec(payload["site"]), url=payload.get("base_url"), **self.scraper_options)
+            self.browser_workers[key] = BrowserWorker(scraper, self.headless_mode)
+        return self.browser_workers[key]
+
+    def run(self):
+        try:
+            while True:
+                task = self.queue.lease(self.worker_id, self.lease_seconds, self.max_attempts)
+                if task is not None:
+                    self.run_task(task)
+                    continue
+                stats = self.queue.stats()
+                if not stats["pending"] and not stats["leased"]:
+                    return
+                # Other workers still hold leases that may expire and come back
+                time.sleep(self.poll_seconds)
+        finally:
+            for worker in self.browser_workers.values():
+                worker.close()
+
+    def heartbeat(self, task, finished, lost):
+        while not finished.wait(self.heartbeat_seconds):
+            if not self.queue.heartbeat(task, self.lease_seconds):
+                lost.set()
+                return
+
+    def run_task(self, task):
+        payload = task.payload
+        partition = f"task-{task.id:06d}-{task.attempt}-{self.worker_id}.jsonl"
+        path = os.path.join(self.output_dir, partition)
+        partial = path + ".partial"
+        finished = threading.Event()
+        lost = threading.Event()
+        heartbeat = threading.Thread(target=self.heartbeat, args=(task, finished, lost), daemon=True)
+        heartbeat.start()
+        try:
+            job = ScrapeJob(payload["term"], payload["max_pages"], payload["start_page"])
+            with JsonLinesSink(partial) as sink, closing(self.browser_worker(payload).iter_pages(job)) as batches:
+                for batch in batches:
+                    sink.write(batch.records)
+                    run_metrics.count("pages")
+                    run_metrics.count("records", len(batch.records))
+                    if lost.is_set():
+                        break
+        except Exception as e:
+            finished.set()
+            if os.path.exists(partial):
+                os.remove(partial)
+            self.queue.fail(task, f"{type(e).__name__}: {str(e).strip()}", self.max_attempts)
+            print(f"{self.worker_id}: job {task.id} ({payload['term']}) failed: {str(e).strip()}", file=sys.stderr)
+            return
+        finally:
+            finished.set()
+            heartbeat.join()
+
+        # Published only under a valid lease; otherwise another worker owns the job now
+        if lost.is_set():
+            os.remove(partial)
+            return
+        os.replace(partial, path)
+        if not self.queue.complete(task, partition):
+            os.remove(path)
+            return
+        print(f"{self.worker_id}: job {task.id} ({payload['term']}, pages {payload['start_page']}-{payload['max_pages']}) done, {sink.count} records", file=sys.stderr)
+
+def run_worker(options):
+    # Entry point of each worker process; options is a plain dict so it pickles
+    if options["politeness"]:
+        with open(options["politeness"], encoding="utf-8") as f:
+            rate_limiter = DomainRateLimiter.from_config(json.load(f))
+    else:
+        rate_limiter = DomainRateLimiter(rate=options["rate"])
+    cache = PageCache(options["cache_dir"]) if options["cache_dir"] else None
+    browser_profile = BrowserProfile.full() if options["browser_profile"] == "full" else BrowserProfile()
+    queue = open_queue(options["queue"], options["queue_name"])
+    try:
+        QueueWorker(
+            queue,
+            options["output_dir"],
+            {"http_mode": not options["browser"], "rate_limiter": rate_limiter, "cache": cache, "browser_profile": browser_profile},
+            headless_mode=not options["show_browser"],
+            lease_seconds=options["lease"],
+            heartbeat_seconds=options["heartbeat"],
+            max_attempts=options["max_attempts"],
+        ).run()
+    finally:
+        queue.close()
+        if cache is not None:
+            cache.close()
+
+def read_partition(path, chunk_size=1000):
+    with open(path, encoding="utf-8") as f:
+        chunk = []
+        for line in f:
+            chunk.append(json.loads(line))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+def merge(queue, output_dir, output, output_format=None, dedup=False, normalize=False):
+    # Concatenates the partitions of all finished jobs in job order
+    results = queue.results()
+    missing = [partition for _, partition in results if not os.path.exists(os.path.join(output_dir, partition))]
+    if missing:
+        raise ValueError(f"{len(missing)} partitions are not in {output_dir}, e.g. {missing[0]}")
+    deduplicator = Deduplicator() if dedup else None
+    with open_sink(output, output_format, normalize=normalize) as sink:
+        for _, partition in results:
+            for records in read_partition(os.path.join(output_dir, partition)):
+                if deduplicator is not None:
+                    records = deduplicator.filter(records)[0]
+                sink.write(records)
+    return len(results), sink.count
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python distributed.py", description="Distributed crawl over a shared work queue.")
+    parser.add_argument("--queue-name", default="scrape", help="key prefix of the queue on Redis")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    submit = commands.add_parser("submit", help="put search jobs on the queue")
+    submit.add_argument("terms", nargs="*", help="search terms")
+    submit.add_argument("--queue", required=True, help="SQLite file or redis:// URL")
+    submit.add_argument("--site", default="yellowpages", help="site name or path to a site spec JSON file")
+    submit.add_argument("--base-url", help="override the site's base URL")
+    submit.add_argument("--terms-file", help="file with one search term per line")
+    submit.add_argument("--max-pages", type=int, default=sys.maxsize, help="last page to scrape (default: all pages)")
+    submit.add_argument("--pages-per-job", type=int, help="split each term into jobs of this many pages (needs --max-pages)")
+
+    work = commands.add_parser("work", help="lease and run jobs until the queue is finished")
+    work.add_argument("--queue", required=True, help="SQLite file or redis:// URL")
+    work.add_argument("--output-dir", default="parts", help="directory for the partition files (shared with merge)")
+    work.add_argument("--processes", type=int, default=1, help="worker processes on this machine")
+    work.add_argument("--lease", type=float, default=120, help="seconds a job stays leased without a heartbeat")
+    work.add_argument("--heartbeat", type=float, default=30, help="seconds between heartbeats")
+    work.add_argument("--max-attempts", type=int, default=3, help="leases per job before it is marked failed")
+    work.add_argument("--rate", type=float, default=0.4, help="requests per second per domain, per worker process")
+    work.add_argument("--politeness", help="JSON file with per-domain politeness policies")
+    work.add_argument("--browser", action="store_true", help="always drive Chrome instead of fetching pages over HTTP")
+    work.add_argument("--show-browser", action="store_true", help="run Chrome with a visible window")
+    work.add_argument("--browser-profile", choices=["lean", "full"], default="lean")
+    work.add_argument("--cache-dir", help="directory for the persistent page cache")
+
+    status = commands.add_parser("status", help="show job counts and failures")
+    status.add_argument("--queue", required=True, help="SQLite file or redis:// URL")
+
+    merge_command = commands.add_parser("merge", help="consolidate the partitions of finished jobs")
+    merge_command.add_argument("--queue", required=True, help="SQLite file or redis:// URL")
+    merge_command.add_argument("--output-dir", default="parts", help="directory holding the partition files")
+    merge_command.add_argument("--output", required=True, help="output file")
+    merge_command.add_argument("--format", help="output format (default: from the output file extension)")
+    merge_command.add_argument("--dedup", action="store_true", help="drop businesses already merged from an earlier partition")
+    merge_command.add_argument("--normalize", action="store_true", help="add E.164 phone, registered domain, postal code and name key columns")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.command == "work":
+        os.makedirs(args.output_dir, exist_ok=True)
+        options = {name: getattr(args, name) for name in (
+            "queue", "queue_name", "output_dir", "lease", "heartbeat", "max_attempts", "rate", "politeness",
+            "browser", "show_browser", "browser_profile", "cache_dir",
+        )}
+        if args.processes <= 1:
+            run_worker(options)
+            return 0
+        processes = [multiprocessing.Process(target=run_worker, args=(options,)) for _ in range(args.processes)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        return 0 if all(process.exitcode == 0 for process in processes) else 1
+
+    queue = open_queue(args.queue, args.queue_name)
+    try:
+        if args.command == "submit":
+            terms = list(args.terms)
+            if args.terms_file:
+                terms.extend(read_terms(args.terms_file))
+            if not terms:
+                print("No search terms given.", file=sys.stderr)
+                return 2
+            if args.pages_per_job and args.max_pages == sys.maxsize:
+                print("--pages-per-job needs --max-pages.", file=sys.stderr)
+                return 2
+            try:
+                spec = load_spec(args.site)
+            except (ValueError, KeyError) as e:
+                print(f"Invalid site {args.site}: {e}", file=sys.stderr)
+                return 2
+            if args.pages_per_job and not spec.page_url:
+                print(f"Warning: {spec.name} has no page_url template, so each job walks the pages before its range.", file=sys.stderr)
+            payloads = job_payloads(args.site, terms, args.max_pages, args.pages_per_job, args.base_url)
+            queue.put(payloads)
+            print(f"Queued {len(payloads)} jobs.", file=sys.stderr)
+
+        elif args.command == "status":
+            stats = queue.stats()
+            print(", ".join(f"{count} {state}" for state, count in stats.items()))
+            for task_id, error in queue.failures():
+                print(f"job {task_id} failed: {error}")
+
+        elif args.command == "merge":
+            stats = queue.stats()
+            if stats["pending"] or stats["leased"]:
+                print(f"Warning: {stats['pending'] + stats['leased']} jobs are not finished yet.", file=sys.stderr)
+            try:
+                jobs, records = merge(queue, args.output_dir, args.output, args.format, args.dedup, args.normalize)
+            except ValueError as e:
+                print(f"Error: {e}", file=sys.stderr)
+                return 1
+            print(f"Merged {jobs} partitions, {records} records, into {args.output}", file=sys.stderr)
+    finally:
+        queue.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,317 @@
+import os
+import sys
+import queue
+import platform
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+from scrape import (
+    CHECKPOINT_FILENAME,
+    BrowserProfile,
+    CheckpointStore,
+    CsvSink,
+    DETAILS_FILENAME,
+    Deduplicator,
+    DetailEnricher,
+    DetailStore,
+    ScrapeJob,
+    ScrapeScheduler,
+    SiteScraper,
+    available_sites,
+    load_site_spec,
+)
+
+class WebScraperGUI:
+    def __init__(self, master):
+        self.master = master
+        master.title("Web Scraper")
+
+        self.scraping_active = False
+        self.default_path = self.get_documents_path()
+        self.site_specs = {spec.label: spec for spec in map(load_site_spec, available_sites())}
+        self.site_spec = None
+        self.headless_mode = False
+        self.remove_duplicates = False
+        self.lean_browser = True
+        self.enrich_details = False
+
+        # Scraping runs on a background thread; it talks to Tk only through ui_queue
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.future = None
+        self.stop_event = None
+        self.ui_queue = queue.Queue()
+        self.records_written = 0
+        self.pages_done = 0
+        # Scraper workers report progress concurrently
+        self.progress_lock = threading.Lock()
+
+        self.frames = {}
+        self.create_widgets()
+
+        # Show the main screen directly
+        self.show_frame('MainScreen')
+
+    def create_widgets(self):
+        self.create_menu()
+
+        self.frames['MainScreen'] = ttk.Frame(self.master)
+
+        self.create_main_screen()
+
+    def create_menu(self):
+        menubar = tk.Menu(self.master)
+        self.master.config(menu=menubar)
+
+        file_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="File", menu=file_menu)
+        file_menu.add_command(label="Set Default Path", command=self.set_default_path)
+        file_menu.add_command(label="Open Default Path", command=self.open_default_path)
+        file_menu.add_command(label="Headless Mode", command=self.toggle_headless_mode)
+        file_menu.add_command(label="Remove Duplicates", command=self.toggle_remove_duplicates)
+        file_menu.add_command(label="Lean Browser", command=self.toggle_lean_browser)
+        file_menu.add_command(label="Fetch Detail Pages", command=self.toggle_enrich_details)
+        file_menu.add_command(label="Stop Scraping", command=self.stop_scraping)
+        file_menu.add_separator()
+        file_menu.add_command(label="Exit", command=self.master.quit)
+
+    def create_main_screen(self):
+        frame = self.frames['MainScreen']
+        frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+
+        self.website_label = ttk.Label(frame, text="Select Website:")
+        self.website_label.grid(row=0, column=0, padx=5, pady=5, sticky=tk.W)
+
+        self.website_combobox = ttk.Combobox(frame, values=list(self.site_specs), state="readonly")
+        self.website_combobox.grid(row=0, column=1, padx=5, pady=5, sticky=(tk.W, tk.E))
+        labels = list(self.site_specs)
+        self.website_combobox.current(labels.index("Yellow Pages") if "Yellow Pages" in labels else 0)
+        self.website_combobox.bind("<<ComboboxSelected>>", self.update_scraper_class)
+        self.update_scraper_class(None)
+
+        self.search_label = ttk.Label(frame, text="Search Term:")
+        self.search_label.grid(row=1, column=0, padx=5, pady=5, sticky=tk.W)
+
+        self.search_entry = ttk.Entry(frame)
+        self.search_entry.grid(row=1, column=1, padx=5, pady=5, sticky=(tk.W, tk.E))
+        self.search_entry.bind('<KeyRelease>', self.update_output_filename)
+
+        self.max_pages_label = ttk.Label(frame, text="Maximum Pages:")
+        self.max_pages_label.grid(row=2, column=0, padx=5, pady=5, sticky=tk.W)
+
+        self.max_pages_entry = ttk.Entry(frame)
+        self.max_pages_entry.grid(row=2, column=1, padx=5, pady=5, sticky=(tk.W, tk.E))
+
+        self.all_pages_var = tk.BooleanVar()
+        self.all_pages_check = ttk.Checkbutton(frame, text="Scrape All Pages", variable=self.all_pages_var, command=self.toggle_max_pages)
+        self.all_pages_check.grid(row=3, column=0, padx=5, pady=5, sticky=tk.W)
+
+        self.resume_var = tk.BooleanVar()
+        self.resume_check = ttk.Checkbutton(frame, text="Resume Previous Run", variable=self.resume_var)
+        self.resume_check.grid(row=3, column=1, padx=5, pady=5, sticky=tk.W)
+
+        self.output_file_label = ttk.Label(frame, text="Output File:")
+        self.output_file_label.grid(row=4, column=0, padx=5, pady=5, sticky=tk.W)
+
+        self.output_file_entry = ttk.Entry(frame)
+        self.output_file_entry.grid(row=4, column=1, padx=5, pady=5, sticky=(tk.W, tk.E))
+
+        self.workers_label = ttk.Label(frame, text="Workers:")
+        self.workers_label.grid(row=5, column=0, padx=5, pady=5, sticky=tk.W)
+
+        self.workers_spinbox = ttk.Spinbox(frame, from_=1, to=16, width=5)
+        self.workers_spinbox.grid(row=5, column=1, padx=5, pady=5, sticky=tk.W)
+        self.workers_spinbox.set(2)
+
+        self.start_button = ttk.Button(frame, text="Start Scraping", command=self.start_scraping)
+        self.start_button.grid(row=6, column=0, columnspan=2, padx=5, pady=10, sticky=(tk.W, tk.E))
+
+        self.progress_label = ttk.Label(frame, text="")
+        self.progress_label.grid(row=7, column=0, columnspan=2, padx=5, pady=5, sticky=(tk.W, tk.E))
+
+    def update_scraper_class(self, event):
+        self.site_spec = self.site_specs.get(self.website_combobox.get())
+
+    def update_output_filename(self, event):
+        search_term = self.search_entry.get().strip().replace(" ", "_")
+        default_filename = f"{search_term}.csv" if search_term else "output.csv"
+        self.output_file_entry.delete(0, tk.END)
+        self.output_file_entry.insert(0, default_filename)
+
+    def toggle_max_pages(self):
+        if self.all_pages_var.get():
+            self.max_pages_entry.configure(state="disabled")
+        else:
+            self.max_pages_entry.configure(state="normal")
+
+    def set_default_path(self):
+        self.default_path = filedialog.askdirectory(initialdir=self.default_path)
+        messagebox.showinfo("Default Path", f"Default path set to:\n{self.default_path}")
+
+    def open_default_path(self):
+        if platform.system() == "Windows":
+            os.startfile(self.default_path)
+        elif platform.system() == "Darwin":
+            subprocess.Popen(["open", self.default_path])
+        else:
+            subprocess.Popen(["xdg-open", self.default_path])
+
+    def get_documents_path(self):
+        if platform.system() == "Windows":
+            return str(Path.home() / "Documents")
+        elif platform.system() == "Darwin":
+            return str(Path.home() / "Documents")
+        else:
+            return str(Path.home())
+
+    def toggle_headless_mode(self):
+        self.headless_mode = not self.headless_mode
+        state = "enabled" if self.headless_mode else "disabled"
+        messagebox.showinfo("Headless Mode", f"Headless mode is now {state}.")
+
+    def toggle_remove_duplicates(self):
+        self.remove_duplicates = not self.remove_duplicates
+        state = "enabled" if self.remove_duplicates else "disabled"
+        messagebox.showinfo("Remove Duplicates", f"Duplicate removal is now {state}.")
+
+    def toggle_lean_browser(self):
+        self.lean_browser = not self.lean_browser
+        state = "enabled" if self.lean_browser else "disabled"
+        messagebox.showinfo("Lean Browser", f"Blocking images, fonts and trackers in Chrome is now {state}.")
+
+    def toggle_enrich_details(self):
+        self.enrich_details = not self.enrich_details
+        state = "enabled" if self.enrich_details else "disabled"
+        messagebox.showinfo("Fetch Detail Pages", f"Filling in missing fields from detail pages is now {state}.")
+
+    def start_scraping(self):
+        if self.scraping_active:
+            messagebox.showwarning("Warning", "Scraping is already in progress.")
+            return
+
+        if self.site_spec is None:
+            messagebox.showwarning("Warning", "Please select a website first.")
+            return
+
+        # Several search terms can be entered separated by ";"
+        search_terms = [term.strip() for term in self.search_entry.get().split(";") if term.strip()]
+        if self.all_pages_var.get():
+            max_pages = sys.maxsize
+        else:
+            max_pages = self.max_pages_entry.get().strip()
+            if not max_pages.isdigit():
+                messagebox.showwarning("Warning", "Please enter a valid number of pages.")
+                return
+            max_pages = int(max_pages)
+
+        output_file = self.output_file_entry.get().strip()
+
+        if not output_file.endswith(".csv"):
+            messagebox.showwarning("Warning", "Output file must be a .csv file.")
+            return
+
+        workers = self.workers_spinbox.get().strip()
+        if not workers.isdigit() or int(workers) < 1:
+            messagebox.showwarning("Warning", "Please enter a valid number of workers.")
+            return
+
+        headless_mode = self.headless_mode
+        resume = self.resume_var.get()
+        output_path = os.path.join(self.default_path, output_file)
+        jobs = [ScrapeJob(term, max_pages) for term in search_terms]
+
+        self.scraping_active = True
+        self.stop_event = threading.Event()
+        self.records_written = 0
+        self.pages_done = 0
+        self.start_button.configure(state="disabled")
+        self.progress_label.config(text="Scraping in progress...")
+
+        self.output_file = output_file
+        self.future = self.executor.submit(self.run_jobs, jobs, int(workers), headless_mode, resume, output_path)
+        self.master.after(200, self.poll_scraping)
+
+    def run_jobs(self, jobs, workers, headless_mode, resume, output_path):
+        # Runs on the executor thread
+        spec = self.site_spec
+        browser_profile = BrowserProfile() if self.lean_browser else BrowserProfile.full()
+
+        def make_scraper():
+            return SiteScraper(spec=spec, captcha_handler=self.ask_captcha, browser_profile=browser_profile)
+
+        checkpoints = CheckpointStore(os.path.join(self.default_path, CHECKPOINT_FILENAME))
+        detail_store = None
+        enricher = None
+        try:
+            deduplicator = Deduplicator() if self.remove_duplicates else None
+            # Sites without detail pages in their spec are scraped as usual
+            if self.enrich_details and spec.detail_link_column:
+                detail_store = DetailStore(os.path.join(self.default_path, DETAILS_FILENAME))
+                enricher = DetailEnricher(spec, store=detail_store)
+            scheduler = ScrapeScheduler(make_scraper, workers, headless_mode, checkpoints, resume, self.stop_event, self.count_progress, deduplicator, enricher)
+            with CsvSink(output_path, append=resume) as sink:
+                scheduler.run(jobs, sink)
+        finally:
+            if enricher is not None:
+                enricher.close()
+            if detail_store is not None:
+                detail_store.close()
+            checkpoints.close()
+
+    def count_progress(self, job, batch):
+        # Called from every worker thread; the Tk thread only reads the counters
+        with self.progress_lock:
+            self.pages_done += 1
+            self.records_written += len(batch.records)
+
+    def ask_captcha(self):
+        solved = threading.Event()
+
+        def show():
+            messagebox.showinfo("CAPTCHA Detected", "CAPTCHA detected. Please solve it manually and then click OK to continue.")
+            solved.set()
+
+        self.ui_queue.put(show)
+        solved.wait()
+
+    def poll_scraping(self):
+        while not self.ui_queue.empty():
+            self.ui_queue.get_nowait()()
+
+        if not self.future.done():
+            state = "Stopping" if self.stop_event.is_set() else "Scraping in progress"
+            self.progress_label.config(text=f"{state}... {self.pages_done} pages, {self.records_written} records")
+            self.master.after(200, self.poll_scraping)
+            return
+
+        self.scraping_active = False
+        self.start_button.configure(state="normal")
+        self.progress_label.config(text="")
+        error = self.future.exception()
+        if error is not None:
+            messagebox.showerror("Error", str(error))
+        elif self.stop_event.is_set():
+            messagebox.showinfo("Stopped", f"Scraping has been stopped. {self.records_written} records saved; tick 'Resume Previous Run' to continue later.")
+        else:
+            messagebox.showinfo("Success", f"Scraping completed! Data saved to {self.output_file}")
+
+    def stop_scraping(self):
+        if not self.scraping_active:
+            messagebox.showinfo("Info", "No active scraping process to stop.")
+            return
+        self.stop_event.set()
+        self.progress_label.config(text="Stopping after the current page...")
+
+    def show_frame(self, frame_name):
+        frame = self.frames[frame_name]
+        frame.tkraise()
+
+def main():
+    root = tk.Tk()
+    app = WebScraperGUI(root)
+    root.mainloop()
+
+if __name__ == "__main__":
+    main()
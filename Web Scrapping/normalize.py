@@ -0,0 +1,126 @@
+# Column-wise normalization of scraped listings with pyarrow compute kernels.
+# The rules come from scrape.py, where the same ones are applied per record for
+# dedup keys and streaming sinks, so both produce identical key columns.
+#
+#   python normalize.py listings.csv listings_clean.parquet
+import os
+import sys
+import csv
+import json
+import argparse
+import pyarrow as pa
+import pyarrow.compute as pc
+from scrape import (
+    E164,
+    FIRST_PHONE,
+    IP_ADDRESS,
+    NON_ALPHANUMERIC_RE2,
+    NON_DIGIT,
+    NORMALIZED_COLUMNS,
+    PHONE_RULES,
+    POSTAL_CODE,
+    REGISTERED_DOMAIN,
+    URL_HOST,
+)
+
+def text_column(table, name):
+    if name not in table.column_names:
+        return pa.array([""] * table.num_rows, pa.string())
+    return pc.fill_null(pc.cast(table[name], pa.string()), "")
+
+def extract(values, pattern):
+    # Value of the pattern's only named group, "" where it does not match
+    return pc.fill_null(pc.struct_field(pc.extract_regex(values, pattern), [0]), "")
+
+def e164_phones(values):
+    parts = pc.extract_regex(values, FIRST_PHONE)
+    digits = pc.replace_substring_regex(pc.fill_null(pc.struct_field(parts, [1]), ""), NON_DIGIT, "")
+    numbers = pc.binary_join_element_wise(pc.fill_null(pc.struct_field(parts, [0]), ""), digits, "")
+    for pattern, replacement in PHONE_RULES:
+        numbers = pc.replace_substring_regex(numbers, pattern, replacement)
+    return pc.if_else(pc.match_substring_regex(numbers, E164), numbers, "")
+
+def registered_domains(values):
+    hosts = pc.utf8_rtrim(extract(pc.utf8_lower(pc.utf8_trim_whitespace(values)), URL_HOST), ".")
+    domains = extract(hosts, REGISTERED_DOMAIN)
+    keep_host = pc.or_(pc.match_substring_regex(hosts, IP_ADDRESS), pc.equal(domains, ""))
+    return pc.if_else(keep_host, hosts, domains)
+
+def postal_codes(values):
+    return extract(values, POSTAL_CODE)
+
+def fold_texts(values):
+    # utf8_lower agrees with str.casefold() except for the few letters casefold expands (ß -> ss)
+    return pc.utf8_trim_whitespace(pc.replace_substring_regex(pc.utf8_lower(values), NON_ALPHANUMERIC_RE2, " "))
+
+def normalize_table(table):
+    # Vectorized scrape.normalize_record: lower-cased emails plus the key columns
+    table = table.select([name for name in table.column_names if name not in NORMALIZED_COLUMNS])
+    if "Email" in table.column_names:
+        # Missing emails stay null, as normalize_record leaves None alone
+        emails = pc.utf8_lower(pc.utf8_trim_whitespace(pc.cast(table["Email"], pa.string())))
+        table = table.set_column(table.column_names.index("Email"), "Email", emails)
+    table = table.append_column("Phone E.164", e164_phones(text_column(table, "Phone")))
+    table = table.append_column("Domain", registered_domains(text_column(table, "Website")))
+    table = table.append_column("Postal Code", postal_codes(text_column(table, "Address")))
+    return table.append_column("Name Key", fold_texts(text_column(table, "Name")))
+
+def read_table(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".parquet":
+        import pyarrow.parquet as pq
+
+        return pq.read_table(path)
+    if extension == ".csv":
+        import pyarrow.csv as pa_csv
+
+        # Every column stays text, so phone numbers and postal codes keep their leading zeros
+        with open(path, newline="", encoding="utf-8") as f:
+            header = next(csv.reader(f), [])
+        return pa_csv.read_csv(path, convert_options=pa_csv.ConvertOptions(
+            column_types={name: pa.string() for name in header}, strings_can_be_null=False,
+        ))
+    if extension == ".jsonl":
+        import pyarrow.json as pa_json
+
+        return pa_json.read_json(path)
+    raise ValueError(f"Unsupported input format: {extension}")
+
+def write_table(table, path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".parquet":
+        import pyarrow.parquet as pq
+
+        pq.write_table(table, path)
+    elif extension == ".csv":
+        import pyarrow.csv as pa_csv
+
+        pa_csv.write_csv(table, path)
+    elif extension == ".jsonl":
+        with open(path, "w", encoding="utf-8") as f:
+            for batch in table.to_batches():
+                for record in batch.to_pylist():
+                    f.write(json.dumps(record, ensure_ascii=False))
+                    f.write("\n")
+    else:
+        raise ValueError(f"Unsupported output format: {extension}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python normalize.py",
+        description="Add E.164 phone, registered domain, postal code and name key columns to a scraped export.",
+    )
+    parser.add_argument("input", help="CSV, JSON Lines or Parquet file written by scrape.py")
+    parser.add_argument("output", help="CSV, JSON Lines or Parquet file to write")
+    args = parser.parse_args(argv)
+    try:
+        table = normalize_table(read_table(args.input))
+        write_table(table, args.output)
+    except (OSError, ValueError, pa.ArrowException) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"Wrote {table.num_rows} normalized records to {args.output}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
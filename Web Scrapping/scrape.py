@@ -1,355 +1,1780 @@
+# Selenium, tkinter, pandas and pyarrow are imported only by the code paths that
+# need them, so the command-line HTTP mode starts without loading any of them.
 import os
 import sys
-import platform
-import subprocess
-from pathlib import Path
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
-import pandas as pd
+import csv
+import json
+import argparse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
+from functools import partial
+from urllib.parse import quote_plus, urlparse
+from lxml import html as lxml_html
+from lxml.cssselect import CSSSelector
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
 import random
-import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
-from fake_useragent import UserAgent
+import queue
+import re
+import hashlib
+import importlib.util
+import sqlite3
+import threading
+
+class RunMetrics:
+    # Process-wide timings and counters for a run: time per phase (fetch, wait,
+    # extract, write, ...), event counters (pages, records, retries, ...) and
+    # hits/misses per fallback selector. Exported as a JSON report or in the
+    # Prometheus text format.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started = time.time()
+            self.counters = Counter()
+            self.phases = {}
+            self.selectors = Counter()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def observe(self, name, seconds):
+        with self.lock:
+            stats = self.phases.setdefault(name, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def record_selectors(self, stats):
+        with self.lock:
+            self.selectors.update(stats)
+
+    def report(self):
+        with self.lock:
+            elapsed = time.time() - self.started
+            selectors = {}
+            for (column, selector, outcome), value in self.selectors.items():
+                selectors.setdefault((column, selector), {"column": column, "selector": selector, "hits": 0, "misses": 0})[outcome] = value
+            return {
+                "started_at": self.started,
+                "elapsed_seconds": elapsed,
+                "pages": self.counters["pages"],
+                "records": self.counters["records"],
+                "pages_per_second": self.counters["pages"] / elapsed if elapsed else 0.0,
+                "records_per_second": self.counters["records"] / elapsed if elapsed else 0.0,
+                "counters": dict(self.counters),
+                "phases": {
+                    name: {"count": count, "total_seconds": total, "mean_seconds": total / count, "max_seconds": longest}
+                    for name, (count, total, longest) in self.phases.items()
+                },
+                "selectors": sorted(selectors.values(), key=lambda entry: (entry["column"], -entry["hits"])),
+            }
+
+    def prometheus(self):
+        report = self.report()
+
+        def label(value):
+            return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+        lines = [
+            "# TYPE scrape_elapsed_seconds gauge",
+            f"scrape_elapsed_seconds {report['elapsed_seconds']}",
+            "# TYPE scrape_events_total counter",
+        ]
+        lines.extend(f'scrape_events_total{{event="{label(name)}"}} {value}' for name, value in sorted(report["counters"].items()))
+        lines.append("# TYPE scrape_phase_seconds_total counter")
+        lines.extend(f'scrape_phase_seconds_total{{phase="{label(name)}"}} {stats["total_seconds"]}' for name, stats in sorted(report["phases"].items()))
+        lines.append("# TYPE scrape_phase_count_total counter")
+        lines.extend(f'scrape_phase_count_total{{phase="{label(name)}"}} {stats["count"]}' for name, stats in sorted(report["phases"].items()))
+        lines.append("# TYPE scrape_phase_max_seconds gauge")
+        lines.extend(f'scrape_phase_max_seconds{{phase="{label(name)}"}} {stats["max_seconds"]}' for name, stats in sorted(report["phases"].items()))
+        for outcome in ("hits", "misses"):
+            lines.append(f"# TYPE scrape_selector_{outcome}_total counter")
+            lines.extend(
+                f'scrape_selector_{outcome}_total{{column="{label(entry["column"])}",selector="{label(entry["selector"])}"}} {entry[outcome]}'
+                for entry in report["selectors"]
+            )
+        return "\n".join(lines) + "\n"
+
+    def write_report(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def write_prometheus(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
+
+run_metrics = RunMetrics()
+
+class FieldRule:
+    # One output column: a chain of fallback CSS selectors tried in order until one
+    # yields a non-empty value.
+    def __init__(self, column, selectors, source="text", strip_prefix=None, href_fallback_prefix=None):
+        self.column = column
+        self.selectors = [CSSSelector(selector) for selector in selectors]
+        self.source = source
+        self.strip_prefix = strip_prefix
+        self.href_fallback_prefix = href_fallback_prefix
+
+    def value_from(self, element):
+        if self.source == "text":
+            value = " ".join(element.text_content().split())
+            if not value and self.href_fallback_prefix:
+                href = element.get("href") or ""
+                if href.startswith(self.href_fallback_prefix):
+                    value = href[len(self.href_fallback_prefix):]
+        else:
+            value = (element.get(self.source) or "").strip()
+            if self.strip_prefix and value.startswith(self.strip_prefix):
+                value = value[len(self.strip_prefix):]
+        return value
+
+    def extract(self, listing, stats):
+        for selector in self.selectors:
+            matches = selector(listing)
+            value = self.value_from(matches[0]) if matches else ""
+            if value:
+                stats[(self.column, selector.css, "hits")] += 1
+                return value
+            stats[(self.column, selector.css, "misses")] += 1
+        return ""
+
+class ListingExtractor:
+    # Parses a whole results page locally instead of querying the WebDriver once per
+    # selector per listing. Selectors are compiled once per extractor.
+    def __init__(self, listing_selector, fields):
+        self.listing_selector = CSSSelector(listing_selector)
+        self.fields = fields
+
+    def parse(self, page_source, base_url=None):
+        document = lxml_html.fromstring(page_source)
+        if base_url:
+            document.make_links_absolute(base_url, resolve_base_href=True)
+        return document
+
+    # Selector hit/miss counts go to stats when given (e.g. to ship them back from
+    # a parser process), otherwise straight into run_metrics.
+    def extract_document(self, document, stats=None):
+        local_stats = Counter()
+        records = [
+            {field.column: field.extract(listing, local_stats) for field in self.fields}
+            for listing in self.listing_selector(document)
+        ]
+        if stats is None:
+            run_metrics.record_selectors(local_stats)
+        else:
+            stats.update(local_stats)
+        return records
+
+    def extract(self, page_source, base_url=None):
+        return self.extract_document(self.parse(page_source, base_url))
+
+class CachedPage:
+    def __init__(self, url, text, from_cache=False, etag=None, last_modified=None, fetched_at=None):
+        self.url = url
+        self.text = text
+        self.from_cache = from_cache
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+
+class PageNotCached(Exception):
+    pass
+
+class PageCache:
+    # On-disk page cache. Bodies are stored once per content hash and an SQLite
+    # index maps each URL to its body plus the validators needed to revalidate it.
+    # Entries older than ttl are revalidated; the least recently used are evicted
+    # once the bodies exceed max_bytes.
+    def __init__(self, directory, ttl=24 * 3600, max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(os.path.join(directory, "index.sqlite3"), check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT PRIMARY KEY, final_url TEXT NOT NULL, digest TEXT NOT NULL, size INTEGER NOT NULL, "
+            "etag TEXT, last_modified TEXT, fetched_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self.connection.commit()
+
+    def blob_path(self, digest):
+        return os.path.join(self.directory, digest[:2], f"{digest}.html")
+
+    def lookup(self, url):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT final_url, digest, etag, last_modified, fetched_at FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            try:
+                with open(self.blob_path(row[1]), encoding="utf-8") as f:
+                    text = f.read()
+            except FileNotFoundError:
+                self.connection.execute("DELETE FROM pages WHERE url = ?", (url,))
+                self.connection.commit()
+                return None
+            self.connection.execute("UPDATE pages SET accessed_at = ? WHERE url = ?", (time.time(), url))
+            self.connection.commit()
+        return CachedPage(row[0], text, True, row[2], row[3], row[4])
+
+    def is_fresh(self, page):
+        return time.time() - page.fetched_at < self.ttl
+
+    def store(self, url, page):
+        body = page.text.encode("utf-8")
+        digest = hashlib.sha256(body).hexdigest()
+        path = self.blob_path(digest)
+        now = time.time()
+        with self.lock:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                temporary_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(temporary_path, "wb") as f:
+                    f.write(body)
+                os.replace(temporary_path, path)
+            old_digest = self._digest_of(url)
+            self.connection.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, page.url, digest, len(body), page.etag, page.last_modified, now, now),
+            )
+            self._remove_unreferenced(old_digest)
+            self._evict()
+            self.connection.commit()
+
+    def touch(self, url):
+        with self.lock:
+            self.connection.execute("UPDATE pages SET fetched_at = ? WHERE url = ?", (time.time(), url))
+            self.connection.commit()
+
+    def discard(self, url):
+        with self.lock:
+            digest = self._digest_of(url)
+            self.connection.execute("DELETE FROM pages WHERE url = ?", (url,))
+            self._remove_unreferenced(digest)
+            self.connection.commit()
+
+    def _digest_of(self, url):
+        row = self.connection.execute("SELECT digest FROM pages WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    def _remove_unreferenced(self, digest):
+        if digest is None:
+            return
+        if self.connection.execute("SELECT 1 FROM pages WHERE digest = ? LIMIT 1", (digest,)).fetchone() is None:
+            try:
+                os.remove(self.blob_path(digest))
+            except FileNotFoundError:
+                pass
+
+    def _evict(self):
+        # Sizes are counted per URL, so pages sharing a body make this slightly conservative
+        total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for url, digest, size in self.connection.execute(
+            "SELECT url, digest, size FROM pages ORDER BY accessed_at"
+        ).fetchall():
+            self.connection.execute("DELETE FROM pages WHERE url = ?", (url,))
+            self._remove_unreferenced(digest)
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def close(self):
+        self.connection.close()
+
+META_CHARSET = re.compile(rb"""<meta[^>]+charset=["']?([\w-]+)""", re.IGNORECASE)
+
+def response_encoding(response):
+    # requests assumes ISO-8859-1 for text/html without a charset; like a browser,
+    # take the page's <meta charset> then, and UTF-8 when it declares none
+    if "charset=" in response.headers.get("Content-Type", "").lower():
+        return response.encoding
+    declared = META_CHARSET.search(response.content[:4096])
+    return declared.group(1).decode("ascii") if declared else "utf-8"
+
+class HttpFetcher:
+    # One pooled keep-alive session shared by every page request of a scraper.
+    # With a cache, fresh pages are served from disk and stale ones are
+    # revalidated with If-None-Match / If-Modified-Since; offline mode never
+    # touches the network.
+    def __init__(self, user_agent=None, timeout=15, pool_size=10, rate_limiter=None, cache=None, offline=False):
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.offline = offline
+        self.session = requests.Session()
+        retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if user_agent is None:
+            from fake_useragent import UserAgent
+
+            user_agent = UserAgent().random
+        self.session.headers["User-Agent"] = user_agent
+
+    def get(self, url):
+        cached = self.cache.lookup(url) if self.cache is not None else None
+        if cached is not None and (self.offline or self.cache.is_fresh(cached)):
+            run_metrics.count("cache_hits")
+            return cached
+        if self.offline:
+            raise PageNotCached(f"{url} is not in the page cache")
+
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        if self.rate_limiter is not None:
+            with run_metrics.phase("rate_limit"):
+                self.rate_limiter.wait(url)
+        with run_metrics.phase("fetch"):
+            response = self.session.get(url, timeout=self.timeout, headers=headers)
+        run_metrics.count("requests")
+        if response.raw is not None and response.raw.retries is not None:
+            run_metrics.count("retries", len(response.raw.retries.history))
+        if response.status_code == 304 and cached is not None:
+            run_metrics.count("cache_revalidated")
+            self.cache.touch(url)
+            return cached
+        response.raise_for_status()
+
+        response.encoding = response_encoding(response)
+        page = CachedPage(response.url, response.text, False, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        if self.cache is not None:
+            self.cache.store(url, page)
+        return page
+
+    def close(self):
+        self.session.close()
+
+class BrowserRequired(Exception):
+    # Raised by the HTTP path when a page needs a real browser (CAPTCHA or a
+    # JavaScript-rendered page); carries enough state for the browser to carry on.
+    def __init__(self, url, page_count):
+        super().__init__(f"Browser required for {url}")
+        self.url = url
+        self.page_count = page_count
+
+class TokenBucket:
+    # Thread-safe token bucket: acquire() blocks until a token is available, so
+    # requests are spaced by the refill rate instead of a fixed sleep.
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class PolitenessPolicy:
+    # How hard one domain may be hit: sustained requests per second, burst size,
+    # parallel crawls and an optional random extra delay per request.
+    def __init__(self, rate=0.4, capacity=1, concurrency=2, jitter=0.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.concurrency = concurrency
+        self.jitter = jitter
+
+class DomainRateLimiter:
+    # Per-domain request rate (token bucket) and concurrency (semaphore) limits,
+    # shared by every scraper and worker that talks to the same host. policies
+    # maps a domain to its own PolitenessPolicy; other domains use default_policy.
+    def __init__(self, rate=0.4, capacity=1, concurrency=2, jitter=0.0, policies=None):
+        self.default_policy = PolitenessPolicy(rate, capacity, concurrency, jitter)
+        self.policies = dict(policies or {})
+        self.buckets = {}
+        self.slots = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        # {"default": {"rate": 0.5, ...}, "domains": {"example.com": {"rate": 2, "concurrency": 4}}}
+        policies = {domain: PolitenessPolicy(**options) for domain, options in config.get("domains", {}).items()}
+        return cls(**config.get("default", {}), policies=policies)
+
+    def policy(self, domain):
+        return self.policies.get(domain, self.default_policy)
+
+    def _domain_state(self, url):
+        domain = urlparse(url).netloc
+        with self.lock:
+            if domain not in self.buckets:
+                policy = self.policy(domain)
+                self.buckets[domain] = TokenBucket(policy.rate, policy.capacity)
+                self.slots[domain] = threading.BoundedSemaphore(policy.concurrency)
+            return self.buckets[domain], self.slots[domain]
+
+    def wait(self, url):
+        self._domain_state(url)[0].acquire()
+        jitter = self.policy(urlparse(url).netloc).jitter
+        if jitter:
+            time.sleep(random.uniform(0, jitter))
+
+    def slot(self, url):
+        return self._domain_state(url)[1]
+
+default_rate_limiter = DomainRateLimiter()
+
+def resource_patterns(extensions):
+    return [pattern for extension in extensions for pattern in (f"*.{extension}", f"*.{extension}?*")]
+
+# URL patterns (Chrome's Network.setBlockedURLs syntax) per resource type
+BLOCKABLE_RESOURCES = {
+    "images": resource_patterns(["png", "jpg", "jpeg", "gif", "webp", "avif", "svg", "ico", "bmp"]),
+    "fonts": resource_patterns(["woff", "woff2", "ttf", "otf", "eot"]),
+    "media": resource_patterns(["mp4", "webm", "mp3", "ogg", "m4a", "wav"]),
+    "stylesheets": resource_patterns(["css"]),
+    "trackers": [
+        "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*googlesyndication.com*",
+        "*googleadservices.com*", "*facebook.net*", "*hotjar.com*", "*scorecardresearch.com*",
+        "*criteo.com*", "*criteo.net*", "*adnxs.com*", "*taboola.com*", "*outbrain.com*",
+    ],
+}
+# Stylesheets stay allowed by default: without them elements the site hides
+# (e.g. an idle CAPTCHA container) count as displayed
+LEAN_BLOCKED_RESOURCES = ("images", "fonts", "media", "trackers")
+
+class BrowserProfile:
+    # How Chrome is started for scraping. The lean defaults skip what extraction
+    # never reads: blocked resource types, no image decoding (headless only), a
+    # page counts as loaded once the DOM is ready, a bounded window instead of a
+    # maximized one and a small throwaway disk cache per Chrome instance.
+    def __init__(self, block=LEAN_BLOCKED_RESOURCES, images=False, page_load_strategy="eager",
+                 window_size=(1280, 900), cache_size=16 * 1024 * 1024, arguments=None):
+        unknown = set(block) - set(BLOCKABLE_RESOURCES)
+        if unknown:
+            raise ValueError(f"Unknown resource types: {', '.join(sorted(unknown))}")
+        self.block = tuple(block)
+        self.images = images
+        self.page_load_strategy = page_load_strategy
+        self.window_size = window_size
+        self.cache_size = cache_size
+        if arguments is None:
+            arguments = ["--disable-extensions", "--disable-background-networking", "--mute-audio", "--no-first-run"]
+        self.arguments = list(arguments)
+
+    @classmethod
+    def full(cls):
+        # Chrome as a person would use it: everything loads, maximized window
+        return cls(block=(), images=True, page_load_strategy="normal", window_size=None, cache_size=None, arguments=[])
+
+    def blocked_urls(self):
+        return [pattern for resource in self.block for pattern in BLOCKABLE_RESOURCES[resource]]
+
+default_browser_profile = BrowserProfile()
+
+class Sink:
+    def write(self, records):
+        raise NotImplementedError("Subclass must implement abstract method")
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class CsvSink(Sink):
+    # Appends each batch to the CSV as it arrives; the header is written once,
+    # when the file is empty. With normalize, records get the key columns of
+    # normalize_record.
+    def __init__(self, path, append=False, normalize=False):
+        self.path = path
+        self.normalize = normalize
+        self.file = open(path, "a" if append else "w", newline="", encoding="utf-8")
+        self.writer = None
+        self.count = 0
+
+    def write(self, records):
+        if not records:
+            return
+        if self.normalize:
+            records = [normalize_record(record) for record in records]
+        if self.writer is None:
+            self.writer = csv.DictWriter(self.file, fieldnames=list(records[0]), extrasaction="ignore")
+            if self.file.tell() == 0:
+                self.writer.writeheader()
+        self.writer.writerows(records)
+        self.file.flush()
+        self.count += len(records)
+
+    def close(self):
+        self.file.close()
+
+class JsonLinesSink(CsvSink):
+    def write(self, records):
+        if self.normalize:
+            records = [normalize_record(record) for record in records]
+        for record in records:
+            self.file.write(json.dumps(record, ensure_ascii=False))
+            self.file.write("\n")
+        self.file.flush()
+        self.count += len(records)
+
+class ColumnBuffer:
+    # Buffered records stored column by column: each column name is kept once
+    # instead of once per record, and repeated values (areas, postcodes, shared
+    # domains...) are interned so repeats share one string. A column stops being
+    # interned once most of its first intern_sample values turn out to be unique.
+    def __init__(self, intern_sample=1000):
+        self.intern_sample = intern_sample
+        self.columns = {}
+        self.interned = {}
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+    def append(self, records):
+        for record in records:
+            for name in record:
+                if name not in self.columns:
+                    self.columns[name] = [None] * self.length
+                    self.interned[name] = {}
+            for name, values in self.columns.items():
+                value = record.get(name)
+                pool = self.interned[name]
+                if pool is not None and isinstance(value, str):
+                    value = pool.setdefault(value, value)
+                    if len(values) + 1 == self.intern_sample and len(pool) > self.intern_sample // 2:
+                        self.interned[name] = None
+                values.append(value)
+            self.length += 1
+
+    # Empties the buffer one column at a time, so the Python and Arrow copies of
+    # the data never exist in full at the same time
+    def take_arrow(self):
+        import pyarrow as pa
+
+        columns = self.columns
+        self.columns = {}
+        self.interned = {}
+        self.length = 0
+        arrays = {}
+        for name in list(columns):
+            # Every column is text; inferring the type would make a column that
+            # happens to be all None here a null column, and later chunks mismatch
+            arrays[name] = pa.array(columns.pop(name), pa.string())
+        return pa.table(arrays)
+
+class ParquetSink(Sink):
+    # Buffers records until a row group is full, so memory is bounded by
+    # row_group_size rather than by the length of the run. With normalize, each
+    # row group is normalized column-wise before it is written. Written batches
+    # may still sit in the buffer and the file has no footer until close(), so a
+    # Parquet output cannot back checkpointed resumes.
+    def __init__(self, path, row_group_size=10000, append=False, normalize=False):
+        if append and os.path.exists(path):
+            raise ValueError(f"Cannot append to the existing Parquet file {path}")
+        self.path = path
+        self.row_group_size = row_group_size
+        self.normalize = normalize
+        self.buffer = ColumnBuffer()
+        self.writer = None
+        self.count = 0
+
+    def write(self, records):
+        self.buffer.append(records)
+        self.count += len(records)
+        if len(self.buffer) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if not len(self.buffer):
+            return
+        import pyarrow.parquet as pq
+
+        table = self.buffer.take_arrow()
+        if self.normalize:
+            from normalize import normalize_table
+
+            table = normalize_table(table)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table, row_group_size=self.row_group_size)
+
+    def close(self):
+        self.flush()
+        if self.writer is not None:
+            self.writer.close()
+
+class DataFrameSink(Sink):
+    # Keeps everything in memory in a ColumnBuffer; pyarrow and pandas are only
+    # imported when the table or frame is built. Buffered records move into Arrow
+    # tables (chunked every chunk_size records), which the frame then wraps
+    # without copying. With normalize, chunks are normalized column-wise.
+    # It writes no file, so it is not in SINKS and neither the CLI nor the GUI
+    # creates one: it is for scraping from Python, e.g.
+    #   sink = DataFrameSink(); ScrapeScheduler(make_scraper).run(jobs, sink); sink.dataframe()
+    def __init__(self, chunk_size=100000, normalize=False):
+        self.chunk_size = chunk_size
+        self.normalize = normalize
+        self.buffer = ColumnBuffer()
+        self.tables = []
+        self.count = 0
+
+    def write(self, records):
+        if self.normalize and not self.arrow_available():
+            records = [normalize_record(record) for record in records]
+        self.buffer.append(records)
+        self.count += len(records)
+        if len(self.buffer) >= self.chunk_size and self.arrow_available():
+            self.take_chunk()
+
+    def arrow_available(self):
+        return importlib.util.find_spec("pyarrow") is not None
+
+    def take_chunk(self):
+        table = self.buffer.take_arrow()
+        if self.normalize:
+            from normalize import normalize_table
+
+            table = normalize_table(table)
+        self.tables.append(table)
+
+    def arrow(self):
+        import pyarrow as pa
+
+        if len(self.buffer):
+            self.take_chunk()
+        if len(self.tables) > 1:
+            self.tables = [pa.concat_tables(self.tables)]
+        return self.tables[0] if self.tables else pa.table({})
+
+    def dataframe(self):
+        import pandas as pd
+
+        if not self.arrow_available():
+            # Built from whole columns, without a dict per record
+            return pd.DataFrame(self.buffer.columns)
+        arrow_dtype = getattr(pd, "ArrowDtype", None)
+        if arrow_dtype is None:
+            return self.arrow().to_pandas()
+        # Arrow-backed columns share the table's buffers instead of copying them
+        return self.arrow().to_pandas(types_mapper=arrow_dtype)
+
+SINKS = {
+    "csv": CsvSink,
+    "jsonl": JsonLinesSink,
+    "parquet": ParquetSink,
+}
+
+def sink_format(path, output_format=None):
+    return output_format or os.path.splitext(path)[1].lstrip(".").lower()
+
+def open_sink(path, output_format=None, **kwargs):
+    output_format = sink_format(path, output_format)
+    if output_format not in SINKS:
+        raise ValueError(f"Unsupported output format: {output_format}")
+    return SINKS[output_format](path, **kwargs)
+
+class PageBatch:
+    def __init__(self, page_number, url, records, has_next, next_url=None):
+        self.page_number = page_number
+        self.url = url
+        self.records = records
+        self.has_next = has_next
+        self.next_url = next_url
+
+class Checkpoint:
+    def __init__(self, page_number, page_url, next_url, records_emitted, completed):
+        self.page_number = page_number
+        self.page_url = page_url
+        self.next_url = next_url
+        self.records_emitted = records_emitted
+        self.completed = completed
+
+class CheckpointStore:
+    # Pagination state of every (site, search term) crawl, updated after each page
+    # has been written to the sink so an interrupted run can pick up where it stopped.
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            "site TEXT NOT NULL, search_term TEXT NOT NULL, page_number INTEGER NOT NULL, "
+            "page_url TEXT, next_url TEXT, records_emitted INTEGER NOT NULL, "
+            "completed INTEGER NOT NULL DEFAULT 0, updated_at REAL NOT NULL, "
+            "PRIMARY KEY (site, search_term))"
+        )
+        self.connection.commit()
+
+    def load(self, site, search_term):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT page_number, page_url, next_url, records_emitted, completed "
+                "FROM checkpoints WHERE site = ? AND search_term = ?",
+                (site, search_term),
+            ).fetchone()
+        if row is None:
+            return None
+        return Checkpoint(row[0], row[1], row[2], row[3], bool(row[4]))
+
+    def save(self, site, search_term, batch, records_emitted):
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (site, search_term, batch.page_number, batch.url, batch.next_url,
+                 records_emitted, int(not batch.has_next), time.time()),
+            )
+            self.connection.commit()
+
+    def clear(self, site, search_term):
+        with self.lock:
+            self.connection.execute("DELETE FROM checkpoints WHERE site = ? AND search_term = ?", (site, search_term))
+            self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+CHECKPOINT_FILENAME = "scrape_checkpoints.sqlite3"
+
+# Hosts shared by many unrelated businesses, so their domain says nothing about identity
+SHARED_DOMAINS = {"facebook.com", "instagram.com", "linkedin.com", "twitter.com", "x.com", "youtube.com", "google.com", "wa.me"}
+
+# Normalization rules, written in the regex subset shared by re and RE2: the
+# per-record helpers below and the vectorized pyarrow versions in normalize.py
+# both use them, so dedup keys and exported key columns always agree.
+# Capture groups are named, as pyarrow's extract_regex requires
+FIRST_PHONE = r"^\s*(?P<plus>\+?)(?P<number>[^/,;]*)"
+NON_DIGIT = r"[^0-9]+"
+# Applied in order to "+"-prefixed or bare digits; anything not shaped like
+# E.164 afterwards is dropped
+PHONE_RULES = [
+    (r"^00", "+"),
+    (r"^(65[3689][0-9]{7})$", r"+\1"),
+    (r"^([3689][0-9]{7})$", r"+65\1"),
+    (r"^(1[38]00[0-9]{7})$", r"+65\1"),
+]
+E164 = r"^\+[1-9][0-9]{7,14}$"
+URL_HOST = r"^(?:[a-z][a-z0-9+.-]*://|//)?(?:[^/@]*@)?(?P<host>[^/:?#]+)"
+IP_ADDRESS = r"^[0-9.]+$"
+SECOND_LEVEL_SUFFIXES = [
+    "com.sg", "edu.sg", "gov.sg", "net.sg", "org.sg", "per.sg",
+    "com.my", "com.hk", "com.au", "net.au", "org.au", "co.uk", "org.uk",
+    "co.nz", "co.id", "co.in", "co.jp", "com.cn", "com.ph",
+]
+REGISTERED_DOMAIN = r"(?P<domain>[^.]+\.(?:%s|[^.]+))$" % "|".join(suffix.replace(".", "\\.") for suffix in SECOND_LEVEL_SUFFIXES)
+POSTAL_CODE = r"(?:^|[^0-9])(?P<code>[0-9]{6})(?:[^0-9]|$)"
+# Anything but a Unicode letter or digit; RE2 (pyarrow) spells it with \p classes,
+# which Python's re lacks
+NON_ALPHANUMERIC = r"[\W_]+"
+NON_ALPHANUMERIC_RE2 = r"[^\p{L}\p{N}]+"
+
+first_phone_pattern = re.compile(FIRST_PHONE)
+non_digit_pattern = re.compile(NON_DIGIT)
+phone_rule_patterns = [(re.compile(pattern), replacement) for pattern, replacement in PHONE_RULES]
+e164_pattern = re.compile(E164)
+url_host_pattern = re.compile(URL_HOST)
+ip_address_pattern = re.compile(IP_ADDRESS)
+registered_domain_pattern = re.compile(REGISTERED_DOMAIN)
+postal_code_pattern = re.compile(POSTAL_CODE)
+non_alphanumeric_pattern = re.compile(NON_ALPHANUMERIC)
+
+def e164_phone(phone):
+    # The first number of the field in E.164 (+6561234567), or "" when it is not a phone number
+    match = first_phone_pattern.match(phone or "")
+    number = match.group("plus") + non_digit_pattern.sub("", match.group("number"))
+    for pattern, replacement in phone_rule_patterns:
+        number = pattern.sub(replacement, number)
+    return number if e164_pattern.match(number) else ""
+
+def registered_domain(website):
+    # https://shop.Example.com.sg/about -> example.com.sg
+    host = url_host_pattern.match((website or "").strip().lower())
+    if not host:
+        return ""
+    host = host.group("host").rstrip(".")
+    if ip_address_pattern.match(host):
+        return host
+    domain = registered_domain_pattern.search(host)
+    return domain.group("domain") if domain else host
+
+def postal_code(address):
+    match = postal_code_pattern.search(address or "")
+    return match.group("code") if match else ""
+
+def fold_text(text):
+    return non_alphanumeric_pattern.sub(" ", (text or "").casefold()).strip()
+
+NORMALIZED_COLUMNS = ["Phone E.164", "Domain", "Postal Code", "Name Key"]
+
+def normalize_record(record):
+    # Adds the key columns to one record; normalize.normalize_table does the same
+    # column-wise for whole tables
+    normalized = dict(record)
+    if normalized.get("Email"):
+        normalized["Email"] = normalized["Email"].strip().lower()
+    normalized["Phone E.164"] = e164_phone(record.get("Phone"))
+    normalized["Domain"] = registered_domain(record.get("Website"))
+    normalized["Postal Code"] = postal_code(record.get("Address"))
+    normalized["Name Key"] = fold_text(record.get("Name"))
+    return normalized
+
+def dedup_keys(record):
+    keys = []
+    phone = e164_phone(record.get("Phone"))
+    if phone:
+        keys.append(f"phone:{phone}")
+    domain = registered_domain(record.get("Website"))
+    if domain and domain not in SHARED_DOMAINS:
+        keys.append(f"domain:{domain}")
+    name = fold_text(record.get("Name"))
+    if name:
+        # The postal code identifies the address regardless of how it is written
+        keys.append(f"name:{name}|{postal_code(record.get('Address')) or fold_text(record.get('Address'))}")
+    return keys
+
+def record_digest(record):
+    return hashlib.sha1(json.dumps(record, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+class DedupIndex:
+    # Business keys seen by earlier runs, each with the digest of the record last
+    # emitted for it, so later runs can tell unchanged businesses from changed ones.
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS business_keys ("
+            "key TEXT PRIMARY KEY, digest TEXT NOT NULL, first_seen REAL NOT NULL, last_seen REAL NOT NULL)"
+        )
+        self.connection.commit()
+
+    def digests(self, keys):
+        placeholders = ", ".join("?" * len(keys))
+        with self.lock:
+            rows = self.connection.execute(f"SELECT digest FROM business_keys WHERE key IN ({placeholders})", keys).fetchall()
+        return {row[0] for row in rows}
+
+    def update(self, entries):
+        now = time.time()
+        with self.lock:
+            self.connection.executemany(
+                "INSERT INTO business_keys VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET digest = excluded.digest, last_seen = excluded.last_seen",
+                [(key, digest, now, now) for key, digest in entries],
+            )
+            self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+class Deduplicator:
+    # Drops records whose phone, website domain or name+address was already seen
+    # in this run. With a DedupIndex it also drops businesses that earlier runs
+    # emitted unchanged, so only new or changed businesses come through.
+    # filter() returns the kept records and their index entries; the entries must
+    # only be committed once the records are in the sink, or a failed write would
+    # leave businesses in the index that were never emitted.
+    def __init__(self, index=None):
+        self.index = index
+        self.seen = set()
+        self.lock = threading.Lock()
+
+    def filter(self, records):
+        kept = []
+        index_entries = []
+        with self.lock:
+            for record in records:
+                keys = dedup_keys(record)
+                if not keys:
+                    kept.append(record)
+                    continue
+                if self.seen.intersection(keys):
+                    continue
+                self.seen.update(keys)
+                if self.index is not None:
+                    digest = record_digest(record)
+                    if digest in self.index.digests(keys):
+                        continue
+                    index_entries.extend((key, digest) for key in keys)
+                kept.append(record)
+        return kept, index_entries
+
+    def commit(self, index_entries):
+        if index_entries:
+            self.index.update(index_entries)
+
+def field_rule(config):
+    return FieldRule(
+        config["column"],
+        config["selectors"],
+        source=config.get("source", "text"),
+        strip_prefix=config.get("strip_prefix"),
+        href_fallback_prefix=config.get("href_fallback_prefix"),
+    )
+
+def is_hidden(element):
+    # Hidden in the static HTML itself: the hidden attribute or an inline
+    # display:none / visibility:hidden on the element or one of its ancestors
+    for node in [element, *element.iterancestors()]:
+        if node.get("hidden") is not None:
+            return True
+        style = (node.get("style") or "").replace(" ", "").lower()
+        if "display:none" in style or "visibility:hidden" in style:
+            return True
+    return False
+
+SITES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sites")
+
+class SiteSpec:
+    # A directory site described as data (see sites/*.json). Every selector is
+    # compiled once here and shared by all scrapers and workers using the spec.
+    def __init__(self, config):
+        self.config = config
+        self.name = config["name"]
+        self.label = config.get("label", self.name)
+        self.base_url = config["base_url"]
+        self.search_url = config["search_url"]
+        # Optional template of the URL of results page N, e.g. "{base_url}?s={query}&page={page}",
+        # so a crawl starting past page 1 can go straight there instead of walking the pages before it
+        self.page_url = config.get("page_url")
+        self.search_input = config.get("search_input")
+        self.listing = config["listing"]
+        self.next_page = config["next_page"]
+        self.captcha = config.get("captcha")
+        self.cookie_notice = config.get("cookie_notice")
+
+        self.extractor = ListingExtractor(self.listing, [field_rule(field) for field in config["fields"]])
+        self.listing_selector = self.extractor.listing_selector
+        self.next_page_selector = CSSSelector(self.next_page)
+        self.captcha_selector = CSSSelector(self.captcha) if self.captcha else None
+
+        # Optional detail pages: link_column names the listing field holding the
+        # detail page URL, fields are looked up on that page
+        detail = config.get("detail")
+        self.detail_link_column = detail["link_column"] if detail else None
+        self.detail_fields = [field_rule(field) for field in detail["fields"]] if detail else []
+
+    def build_search_url(self, base_url, search_term):
+        return self.search_url.format(base_url=base_url, query=quote_plus(search_term))
+
+    def build_page_url(self, base_url, search_term, page):
+        if not self.page_url:
+            return None
+        return self.page_url.format(base_url=base_url, query=quote_plus(search_term), page=page)
+
+    def start_position(self, base_url, search_term, start_page=1, resume_from=None):
+        # Where a results crawl begins: (first page to extract, URL to start at or
+        # None for the search itself, pages already behind that URL)
+        start_url = None
+        page_count = 0
+        if resume_from is not None:
+            start_page = max(start_page, resume_from.page_number + 1)
+            # Without a next-page URL (e.g. a JavaScript pager) the already emitted pages are walked again but skipped
+            if resume_from.next_url:
+                start_url = resume_from.next_url
+                page_count = resume_from.page_number
+        if start_url is None and start_page > 1:
+            # Without a page URL template the pages before start_page are walked
+            page_url = self.build_page_url(base_url, search_term, start_page)
+            if page_url:
+                start_url = page_url
+                page_count = start_page - 1
+        return start_page, start_url, page_count
+
+    def has_captcha(self, document):
+        # Sites ship an idle, hidden CAPTCHA container on ordinary pages; only a shown one counts
+        if self.captcha_selector is None:
+            return False
+        return any(not is_hidden(element) for element in self.captcha_selector(document))
+
+    def needs_browser(self, document):
+        return self.has_captcha(document) or not self.listing_selector(document)
+
+    def next_link(self, document):
+        links = self.next_page_selector(document)
+        if not links:
+            return False, None
+        return True, links[0].get("href") or None
+
+    def extract_detail(self, document, stats):
+        return {field.column: field.extract(document, stats) for field in self.detail_fields}
+
+def load_spec_file(path):
+    with open(path, encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            import yaml
+
+            return SiteSpec(yaml.safe_load(f))
+        return SiteSpec(json.load(f))
+
+site_specs = {}
+site_specs_lock = threading.Lock()
+
+def load_site_spec(name):
+    with site_specs_lock:
+        if name not in site_specs:
+            for extension in (".json", ".yaml", ".yml"):
+                path = os.path.join(SITES_DIR, name + extension)
+                if os.path.exists(path):
+                    site_specs[name] = load_spec_file(path)
+                    break
+            else:
+                raise ValueError(f"Unknown site: {name}")
+        return site_specs[name]
+
+def available_sites():
+    return sorted({os.path.splitext(filename)[0] for filename in os.listdir(SITES_DIR) if filename.endswith((".json", ".yaml", ".yml"))})
+
+def prompt_captcha():
+    input("CAPTCHA detected. Please solve it in the browser window, then press Enter to continue...")
+
+class CaptchaRequired(Exception):
+    pass
+
+def refuse_captcha():
+    # Headless Chrome has no window to solve the CAPTCHA in, so the job fails instead of waiting
+    raise CaptchaRequired("CAPTCHA detected with a headless browser; rerun with --show-browser --resume to solve it")
 
 class WebsiteScraper:
-    def __init__(self, url):
+    def __init__(self, url, http_mode=True, rate_limiter=None, cache=None, offline=False, captcha_handler=None, browser_profile=None):
         self.url = url
+        self.http_mode = http_mode
+        self.rate_limiter = rate_limiter or default_rate_limiter
+        self.browser_profile = browser_profile or default_browser_profile
+        self.cache = cache
+        self.offline = offline
+        # Called (on the scraping thread) while a CAPTCHA waits to be solved in the browser
+        self.captcha_handler = captcha_handler or prompt_captcha
 
-    def scrape_data(self, search_term, max_pages, headless_mode):
+    # Yields one PageBatch per extracted results page. Pages are counted from the
+    # first results page; pages before start_page are walked through but not
+    # extracted, and max_pages is the last page to visit. resume_from is a
+    # Checkpoint whose pages have already been emitted. driver_factory, if given,
+    # supplies a shared Chrome when an HTTP-mode page turns out to need one.
+    def iter_pages(self, search_term, max_pages, headless_mode, driver=None, start_page=1, resume_from=None, driver_factory=None):
         raise NotImplementedError("Subclass must implement abstract method")
 
-class YellowPagesScraper(WebsiteScraper):
-    def __init__(self):
-        super().__init__("https://listing.yellowpages.com.sg/")
+    def close(self):
+        pass
 
-    def scrape_data(self, search_term, max_pages, headless_mode):
+    def site_key(self):
+        return urlparse(self.url).netloc
+
+    def scrape_data(self, search_term, max_pages, headless_mode, driver=None, start_page=1, resume_from=None):
         data = []
-        page_count = 0
         max_page_reached = False
+        for batch in self.iter_pages(search_term, max_pages, headless_mode, driver, start_page, resume_from):
+            data.extend(batch.records)
+            max_page_reached = not batch.has_next
+        return data, max_page_reached
 
-        chrome_options = Options()
-        chrome_options.add_argument("--start-maximized")
-        chrome_options.add_argument("--disable-popup-blocking")
-        
-        if headless_mode:
-            chrome_options.add_argument("--headless")
-            chrome_options.add_argument("--disable-gpu")
+class SiteScraper(WebsiteScraper):
+    # Runs any SiteSpec: HTTP fetching with browser fallback, page-source
+    # extraction and pagination all come from the spec.
+    spec_name = None
 
-        user_agent = UserAgent().random
-        chrome_options.add_argument(f"user-agent={user_agent}")
+    def __init__(self, url=None, spec=None, **options):
+        self.spec = spec or load_site_spec(self.spec_name)
+        super().__init__(url or self.spec.base_url, **options)
+        self.fetcher = None
+        self.extractor = self.spec.extractor
 
-        driver = webdriver.Chrome(options=chrome_options)
+    def search_url(self, search_term):
+        return self.spec.build_search_url(self.url, search_term)
+
+    def iter_pages(self, search_term, max_pages, headless_mode, driver=None, start_page=1, resume_from=None, driver_factory=None):
+        start_page, start_url, page_count = self.spec.start_position(self.url, search_term, start_page, resume_from)
+        if not self.http_mode:
+            yield from self.iter_pages_browser(search_term, max_pages, headless_mode, driver, start_page, start_url, page_count)
+            return
         try:
-            driver.get(self.url)
-            search_box = WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.NAME, "s")))
-            search_box.send_keys(search_term)
-            search_box.send_keys(Keys.RETURN)
-            time.sleep(random.uniform(2, 3))
+            yield from self.iter_pages_http(search_term, max_pages, start_page, start_url, page_count)
+        except BrowserRequired as e:
+            if driver is None and driver_factory is not None:
+                driver = driver_factory()
+            yield from self.iter_pages_browser(search_term, max_pages, headless_mode, driver, start_page, e.url, e.page_count)
 
-            while page_count < max_pages:
-                # Detect CAPTCHA
-                try:
-                    captcha_element = driver.find_element(By.CSS_SELECTOR, ".captcha")
-                    if captcha_element.is_displayed():
-                        messagebox.showinfo("CAPTCHA Detected", "CAPTCHA detected. Please solve it manually and then click OK to continue.")
-                        driver.refresh()
-                        time.sleep(random.uniform(2, 3))
-                        continue
-                except NoSuchElementException:
-                    pass
+    def close(self):
+        if self.fetcher is not None:
+            self.fetcher.close()
+            self.fetcher = None
 
-                # Close cookie notice if present
-                try:
-                    cookie_notice_close = driver.find_element(By.CSS_SELECTOR, "div.cookie-notice-container button.close")
-                    if cookie_notice_close.is_displayed():
-                        cookie_notice_close.click()
-                        time.sleep(random.uniform(1, 2))
-                except NoSuchElementException:
-                    pass
-
-                # Wait for listings to load
-                WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CLASS_NAME, "listing")))
-
-                listings = driver.find_elements(By.CLASS_NAME, "listing")
-                for listing in listings:
-                    name = listing.find_element(By.TAG_NAME, "h2").text.strip() if listing.find_elements(By.TAG_NAME, "h2") else ""
-                    
-                    address = ""
-                    address_selectors = ["address", ".location", ".address", "[itemprop='address']"]
-                    for selector in address_selectors:
-                        try:
-                            address_elem = listing.find_element(By.CSS_SELECTOR, selector)
-                            address = address_elem.text.strip()
-                            if address:
-                                break
-                        except NoSuchElementException:
-                            continue
+    def iter_pages_http(self, search_term, max_pages, start_page=1, start_url=None, page_count=0):
+        if self.fetcher is None:
+            self.fetcher = HttpFetcher(rate_limiter=self.rate_limiter, cache=self.cache, offline=self.offline)
 
-                    phone = ""
-                    phone_selectors = ["a.phone", ".phone", "[itemprop='telephone']", "[data-tracking='phone']"]
-                    for selector in phone_selectors:
-                        try:
-                            phone_elem = listing.find_element(By.CSS_SELECTOR, selector)
-                            phone = phone_elem.text.strip()
-                            if not phone:
-                                href = phone_elem.get_attribute("href")
-                                if href and href.startswith("tel:"):
-                                    phone = href[4:]
-                            if phone:
-                                break
-                        except NoSuchElementException:
-                            continue
+        url = start_url or self.search_url(search_term)
 
-                    website = ""
-                    website_selectors = ["a.website", ".website", "[itemprop='url']", "[data-tracking='website']"]
-                    for selector in website_selectors:
-                        try:
-                            website_elem = listing.find_element(By.CSS_SELECTOR, selector)
-                            website = website_elem.get_attribute("href")
-                            if website:
-                                break
-                        except NoSuchElementException:
-                            continue
+        while page_count < max_pages:
+            page = self.fetcher.get(url)
+            with run_metrics.phase("parse"):
+                document = self.extractor.parse(page.text, page.url)
 
-                    email = ""
-                    email_selectors = ["a.email", ".email", "[itemprop='email']", "[data-tracking='email']"]
-                    for selector in email_selectors:
-                        try:
-                            email_elem = listing.find_element(By.CSS_SELECTOR, selector)
-                            email = email_elem.get_attribute("href")
-                            if email and email.startswith("mailto:"):
-                                email = email[7:]
-                            if email:
-                                break
-                        except NoSuchElementException:
-                            continue
+            # CAPTCHA pages and pages whose listings are rendered by JavaScript need the browser
+            if self.spec.needs_browser(document):
+                run_metrics.count("browser_fallbacks")
+                if self.cache is not None:
+                    self.cache.discard(url)
+                if self.offline:
+                    raise PageNotCached(f"{url} needs a browser and cannot be scraped offline")
+                raise BrowserRequired(url, page_count)
+
+            page_count += 1
+            next_url = self.spec.next_link(document)[1]
+            if page_count >= start_page:
+                with run_metrics.phase("extract"):
+                    records = self.extractor.extract_document(document)
+                yield PageBatch(page_count, url, records, bool(next_url), next_url)
+
+            if not next_url:
+                break
+            url = next_url
+
+    def iter_pages_browser(self, search_term, max_pages, headless_mode, driver=None, start_page=1, start_url=None, page_count=0):
+        from browser import By, EC, Keys, NoSuchElementException, TimeoutException
+        from browser import LISTING_SIGNATURE_SCRIPT, blocking_lifted, create_chrome_driver, listing_set_changed, quit_chrome_driver, wait_for
 
-                    data.append({
-                        "Name": name,
-                        "Address": address,
-                        "Phone": phone,
-                        "Website": website,
-                        "Email": email
-                    })
+        spec = self.spec
+        # Matches nothing when the site has no CAPTCHA selector
+        captcha = spec.captcha or "captcha-not-configured"
+
+        def wait(condition):
+            with run_metrics.phase("wait"):
+                return wait_for(driver, condition)
+
+        def navigate(url):
+            with run_metrics.phase("rate_limit"):
+                self.rate_limiter.wait(url)
+            with run_metrics.phase("navigate"):
+                driver.get(url)
+
+        owns_driver = driver is None
+        if owns_driver:
+            with run_metrics.phase("driver_start"):
+                driver = create_chrome_driver(headless_mode, self.browser_profile)
+        try:
+            if start_url:
+                navigate(start_url)
+            elif spec.search_input:
+                navigate(self.url)
+                search_box = wait(EC.presence_of_element_located((By.NAME, spec.search_input)))
+                self.rate_limiter.wait(self.url)
+                search_box.send_keys(search_term)
+                search_box.send_keys(Keys.RETURN)
+                wait(EC.staleness_of(search_box))
+            else:
+                navigate(self.search_url(search_term))
+
+            while page_count < max_pages:
+                # Returns as soon as either the results or a CAPTCHA have rendered; a
+                # hidden CAPTCHA container does not count
+                wait(EC.any_of(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, spec.listing)),
+                    EC.visibility_of_element_located((By.CSS_SELECTOR, captcha)),
+                ))
+
+                # Detect CAPTCHA (find_elements avoids a NoSuchElementException round-trip on the common path)
+                captcha_elements = driver.find_elements(By.CSS_SELECTOR, captcha)
+                if captcha_elements and captcha_elements[0].is_displayed():
+                    run_metrics.count("captchas")
+                    with run_metrics.phase("captcha"), blocking_lifted(driver):
+                        self.captcha_handler()
+                    self.rate_limiter.wait(driver.current_url)
+                    driver.refresh()
+                    continue
+
+                # Close cookie notice if present
+                if spec.cookie_notice:
+                    cookie_notice_buttons = driver.find_elements(By.CSS_SELECTOR, spec.cookie_notice)
+                    if cookie_notice_buttons and cookie_notice_buttons[0].is_displayed():
+                        cookie_notice_buttons[0].click()
+                        wait(EC.invisibility_of_element(cookie_notice_buttons[0]))
+
+                # Make sure listings are there, then parse the whole page in one go
+                listings = wait(EC.presence_of_all_elements_located((By.CSS_SELECTOR, spec.listing)))
 
                 page_count += 1
-                if page_count >= max_pages:
+                url = driver.current_url
+                with run_metrics.phase("page_source"):
+                    page_source = driver.page_source
+                if self.cache is not None:
+                    # Rendered pages are cached too, so reruns can take the HTTP path offline
+                    self.cache.store(url, CachedPage(url, page_source))
+                with run_metrics.phase("parse"):
+                    document = self.extractor.parse(page_source, url)
+                has_next, next_url = spec.next_link(document)
+                if page_count >= start_page:
+                    with run_metrics.phase("extract"):
+                        records = self.extractor.extract_document(document)
+                    yield PageBatch(page_count, url, records, has_next, next_url)
+
+                if page_count >= max_pages or not has_next:
                     break
 
                 try:
-                    next_button = WebDriverWait(driver, 10).until(
-                        EC.element_to_be_clickable((By.CSS_SELECTOR, "a.next"))
-                    )
+                    next_button = wait(EC.element_to_be_clickable((By.CSS_SELECTOR, spec.next_page)))
                     driver.execute_script("arguments[0].scrollIntoView(true);", next_button)
+                    signature = driver.execute_script(LISTING_SIGNATURE_SCRIPT, spec.listing)
+                    with run_metrics.phase("rate_limit"):
+                        self.rate_limiter.wait(url)
                     next_button.click()
-                    time.sleep(random.uniform(2, 3))
+                    wait(EC.any_of(
+                        listing_set_changed(spec.listing, listings[0], signature),
+                        # Only a shown CAPTCHA: a hidden one may still be the old page's
+                        EC.visibility_of_element_located((By.CSS_SELECTOR, captcha)),
+                    ))
                 except (NoSuchElementException, TimeoutException):
-                    max_page_reached = True
                     break
 
         finally:
-            driver.quit()
-        
-        return data, max_page_reached
+            if owns_driver:
+                quit_chrome_driver(driver)
 
-class StreetDirectoryScraper(WebsiteScraper):
-    def __init__(self):
-        super().__init__("https://www.streetdirectory.com/businessfinder/company_listing.php")
+class YellowPagesScraper(SiteScraper):
+    spec_name = "yellowpages"
 
-    def scrape_data(self, search_term, max_pages, headless_mode):
-        # Implement scraping logic for StreetDirectory
-        # This is a placeholder and should be implemented based on the website's structure
-        return [], False
+class StreetDirectoryScraper(SiteScraper):
+    spec_name = "streetdirectory"
 
-class TimesBusinessDirectoryScraper(WebsiteScraper):
-    def __init__(self):
-        super().__init__("https://www.timesbusinessdirectory.com/company-listings")
+class TimesBusinessDirectoryScraper(SiteScraper):
+    spec_name = "timesbusinessdirectory"
 
-    def scrape_data(self, search_term, max_pages, headless_mode):
-        # Implement scraping logic for TimesBusinessDirectory
-        # This is a placeholder and should be implemented based on the website's structure
-        return [], False
+DETAILS_FILENAME = "scrape_details.sqlite3"
 
-class WebScraperGUI:
-    def __init__(self, master):
-        self.master = master
-        master.title("Web Scraper")
+class DetailStore:
+    # Fields already looked up on each detail page, so a business is enriched once
+    # and never fetched again by later runs.
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS details (url TEXT PRIMARY KEY, fields TEXT NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        self.connection.commit()
 
-        self.scraping_active = False
-        self.default_path = self.get_documents_path()
-        self.scraper = None
-        self.headless_mode = False
+    def get(self, url):
+        with self.lock:
+            row = self.connection.execute("SELECT fields FROM details WHERE url = ?", (url,)).fetchone()
+        return json.loads(row[0]) if row else None
 
-        self.frames = {}
-        self.create_widgets()
+    def put(self, url, fields):
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO details VALUES (?, ?, ?)",
+                (url, json.dumps(fields, ensure_ascii=False), time.time()),
+            )
+            self.connection.commit()
 
-        # Show the main screen directly
-        self.show_frame('MainScreen')
+    def close(self):
+        self.connection.close()
 
-    def create_widgets(self):
-        self.create_menu()
+class DetailEnricher:
+    # Second pipeline stage: fetches the detail page of every record missing one of
+    # the spec's detail fields on its own thread pool and rate limiter, then fills
+    # those fields in. Lookups of a URL already being fetched share that fetch;
+    # finished lookups are dropped, so memory does not grow with the run, and the
+    # store answers later lookups of the same URL. Batches are published in the
+    # order they were submitted, so checkpoints still follow the pages; up to
+    # max_pending batches may wait for their details while the results crawl runs
+    # ahead, after which submit() blocks.
+    def __init__(self, spec, workers=4, rate_limiter=None, cache=None, offline=False, store=None, max_pending=16):
+        if not spec.detail_link_column:
+            raise ValueError(f"Site {spec.name} has no detail pages configured")
+        self.spec = spec
+        self.store = store
+        self.fetcher = HttpFetcher(
+            pool_size=workers,
+            rate_limiter=rate_limiter or DomainRateLimiter(concurrency=workers),
+            cache=cache,
+            offline=offline,
+        )
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="detail")
+        self.in_flight = {}
+        self.lock = threading.Lock()
+        self.pending = queue.Queue(max_pending)
+        self.errors = []
+        self.writer = threading.Thread(target=self.publish_batches, daemon=True)
+        self.writer.start()
 
-        self.frames['MainScreen'] = ttk.Frame(self.master)
+    def missing(self, record):
+        return [field.column for field in self.spec.detail_fields if not record.get(field.column)]
 
-        self.create_main_screen()
+    # publish() is called on the enricher's writer thread once the batch's records
+    # have been enriched
+    def submit(self, batch, publish):
+        self.raise_errors()
+        lookups = []
+        for record in batch.records:
+            url = record.get(self.spec.detail_link_column)
+            if url and self.missing(record):
+                lookups.append((record, self.lookup(url)))
+        self.pending.put((lookups, publish))
 
-    def create_menu(self):
-        menubar = tk.Menu(self.master)
-        self.master.config(menu=menubar)
+    def lookup(self, url):
+        with self.lock:
+            future = self.in_flight.get(url)
+            if future is not None:
+                return future
+            future = self.in_flight[url] = self.pool.submit(self.fetch_details, url)
+        # Outside the lock: an already finished future runs the callback right here
+        future.add_done_callback(partial(self.finished, url))
+        return future
 
-        file_menu = tk.Menu(menubar, tearoff=0)
-        menubar.add_cascade(label="File", menu=file_menu)
-        file_menu.add_command(label="Set Default Path", command=self.set_default_path)
-        file_menu.add_command(label="Open Default Path", command=self.open_default_path)
-        file_menu.add_command(label="Headless Mode", command=self.toggle_headless_mode)
-        file_menu.add_command(label="Stop Scraping", command=self.stop_scraping)
-        file_menu.add_separator()
-        file_menu.add_command(label="Exit", command=self.master.quit)
+    def finished(self, url, future):
+        with self.lock:
+            if self.in_flight.get(url) is future:
+                del self.in_flight[url]
 
-    def create_main_screen(self):
-        frame = self.frames['MainScreen']
-        frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+    def fetch_details(self, url):
+        if self.store is not None:
+            fields = self.store.get(url)
+            if fields is not None:
+                run_metrics.count("detail_store_hits")
+                return fields
+        try:
+            page = self.fetcher.get(url)
+        except (requests.RequestException, PageNotCached):
+            run_metrics.count("detail_errors")
+            return {}
+        stats = Counter()
+        with run_metrics.phase("detail_extract"):
+            # One malformed page (e.g. an empty body) only costs its own fields
+            try:
+                document = self.spec.extractor.parse(page.text, page.url)
+                # A CAPTCHA instead of the page is not remembered, so the next run tries again
+                if self.spec.has_captcha(document):
+                    run_metrics.count("detail_captchas")
+                    return {}
+                fields = self.spec.extract_detail(document, stats)
+            except Exception:
+                run_metrics.count("detail_errors")
+                return {}
+        run_metrics.count("detail_pages")
+        run_metrics.record_selectors({(f"{column} (detail)", selector, outcome): value for (column, selector, outcome), value in stats.items()})
+        if self.store is not None:
+            self.store.put(url, fields)
+        return fields
 
-        self.website_label = ttk.Label(frame, text="Select Website:")
-        self.website_label.grid(row=0, column=0, padx=5, pady=5, sticky=tk.W)
+    def publish_batches(self):
+        while True:
+            item = self.pending.get()
+            try:
+                if item is None:
+                    return
+                lookups, publish = item
+                with run_metrics.phase("detail_wait"):
+                    for record, lookup in lookups:
+                        fields = lookup.result()
+                        for column in self.missing(record):
+                            if fields.get(column):
+                                record[column] = fields[column]
+                                run_metrics.count("detail_fields_filled")
+                # After a failure nothing more is published, so checkpoints never skip a batch
+                if not self.errors:
+                    publish()
+            except Exception as e:
+                self.errors.append(e)
+            finally:
+                self.pending.task_done()
 
-        self.website_combobox = ttk.Combobox(frame, values=["Yellow Pages", "Street Directory", "Times Business Directory"], state="readonly")
-        self.website_combobox.grid(row=0, column=1, padx=5, pady=5, sticky=(tk.W, tk.E))
-        self.website_combobox.current(0)  # Default to the first option
-        self.website_combobox.bind("<<ComboboxSelected>>", self.update_scraper_class)
+    def raise_errors(self):
+        if self.errors:
+            raise self.errors[0]
 
-        self.search_label = ttk.Label(frame, text="Search Term:")
-        self.search_label.grid(row=1, column=0, padx=5, pady=5, sticky=tk.W)
+    # Waits until every submitted batch has been published
+    def join(self):
+        self.pending.join()
+        self.raise_errors()
 
-        self.search_entry = ttk.Entry(frame)
-        self.search_entry.grid(row=1, column=1, padx=5, pady=5, sticky=(tk.W, tk.E))
-        self.search_entry.bind('<KeyRelease>', self.update_output_filename)
+    def close(self):
+        self.pending.put(None)
+        self.writer.join()
+        self.pool.shutdown()
+        self.fetcher.close()
 
-        self.max_pages_label = ttk.Label(frame, text="Maximum Pages:")
-        self.max_pages_label.grid(row=2, column=0, padx=5, pady=5, sticky=tk.W)
+class ScrapeJob:
+    def __init__(self, search_term, max_pages, start_page=1):
+        self.search_term = search_term
+        self.max_pages = max_pages
+        self.start_page = start_page
 
-        self.max_pages_entry = ttk.Entry(frame)
-        self.max_pages_entry.grid(row=2, column=1, padx=5, pady=5, sticky=(tk.W, tk.E))
+class BatchPublisher:
+    # The write side shared by ScrapeScheduler and crawler.AsyncCrawler: each
+    # batch is filtered by the deduplicator, enriched if there is an enricher,
+    # then written to the sink, checkpointed and its dedup keys committed. A job's
+    # batches must be delivered in page order; progress, if given, is called with
+    # (job, batch) after each batch is written.
+    def __init__(self, sink, checkpoints=None, resume=False, progress=None, deduplicator=None, enricher=None):
+        self.sink = sink
+        self.checkpoints = checkpoints
+        self.resume = resume
+        self.progress = progress
+        self.deduplicator = deduplicator
+        self.enricher = enricher
+        self.lock = threading.Lock()
+        self.sites = {}
+        self.records_emitted = {}
+        self.max_page_reached = {}
 
-        self.all_pages_var = tk.BooleanVar()
-        self.all_pages_check = ttk.Checkbutton(frame, text="Scrape All Pages", variable=self.all_pages_var, command=self.toggle_max_pages)
-        self.all_pages_check.grid(row=3, column=0, columnspan=2, padx=5, pady=5, sticky=tk.W)
+    # Returns the checkpoint to resume the job from, or None to start it afresh
+    def resume_point(self, site, job):
+        checkpoint = None
+        if self.checkpoints is not None:
+            if self.resume:
+                checkpoint = self.checkpoints.load(site, job.search_term)
+            else:
+                self.checkpoints.clear(site, job.search_term)
+        self.sites[job] = site
+        self.records_emitted[job] = checkpoint.records_emitted if checkpoint is not None else 0
+        return checkpoint
 
-        self.output_file_label = ttk.Label(frame, text="Output File:")
-        self.output_file_label.grid(row=4, column=0, padx=5, pady=5, sticky=tk.W)
+    def already_done(self, job, checkpoint):
+        if checkpoint is not None and (checkpoint.completed or checkpoint.page_number >= job.max_pages):
+            self.max_page_reached[job] = checkpoint.completed
+            return True
+        return False
 
-        self.output_file_entry = ttk.Entry(frame)
-        self.output_file_entry.grid(row=4, column=1, padx=5, pady=5, sticky=(tk.W, tk.E))
+    def deliver(self, job, batch):
+        index_entries = []
+        if self.deduplicator is not None:
+            with run_metrics.phase("dedup"):
+                batch.records, index_entries = self.deduplicator.filter(batch.records)
+        if self.enricher is None:
+            self.publish(job, batch, index_entries)
+        else:
+            # submit() blocks while too many batches wait for details
+            self.enricher.submit(batch, partial(self.publish, job, batch, index_entries))
 
-        self.start_button = ttk.Button(frame, text="Start Scraping", command=self.start_scraping)
-        self.start_button.grid(row=6, column=0, columnspan=2, padx=5, pady=10, sticky=(tk.W, tk.E))
+    def publish(self, job, batch, index_entries):
+        with self.lock, run_metrics.phase("write"):
+            self.sink.write(batch.records)
+        run_metrics.count("pages")
+        run_metrics.count("records", len(batch.records))
+        # Counted once the batch is written, so a checkpoint never counts records the sink lacks
+        self.records_emitted[job] += len(batch.records)
+        if self.checkpoints is not None:
+            self.checkpoints.save(self.sites[job], job.search_term, batch, self.records_emitted[job])
+        if self.deduplicator is not None:
+            self.deduplicator.commit(index_entries)
+        self.max_page_reached[job] = not batch.has_next
+        if self.progress is not None:
+            self.progress(job, batch)
 
-        self.progress_label = ttk.Label(frame, text="")
-        self.progress_label.grid(row=7, column=0, columnspan=2, padx=5, pady=5, sticky=(tk.W, tk.E))
+    # Waits for the enricher to publish every batch delivered so far
+    def join(self):
+        if self.enricher is not None:
+            self.enricher.join()
 
-    def update_scraper_class(self, event):
-        website = self.website_combobox.get()
-        if website == "Yellow Pages":
-            self.scraper = YellowPagesScraper()
-        elif website == "Street Directory":
-            self.scraper = StreetDirectoryScraper()
-        elif website == "Times Business Directory":
-            self.scraper = TimesBusinessDirectoryScraper()
+    def finished(self, jobs):
+        return all(self.max_page_reached.get(job, False) for job in jobs)
 
-    def update_output_filename(self, event):
-        search_term = self.search_entry.get().strip().replace(" ", "_")
-        default_filename = f"{search_term}.csv" if search_term else "output.csv"
-        self.output_file_entry.delete(0, tk.END)
-        self.output_file_entry.insert(0, default_filename)
+class BrowserWorker:
+    # Owns one scraper and, when needed, one Chrome instance that is started once
+    # and reused for every job the worker picks up.
+    def __init__(self, scraper, headless_mode):
+        self.scraper = scraper
+        self.headless_mode = headless_mode
+        self.driver = None
 
-    def toggle_max_pages(self):
-        if self.all_pages_var.get():
-            self.max_pages_entry.configure(state="disabled")
-        else:
-            self.max_pages_entry.configure(state="normal")
+    def warm_up(self):
+        if self.driver is None:
+            from browser import create_chrome_driver
 
-    def set_default_path(self):
-        self.default_path = filedialog.askdirectory(initialdir=self.default_path)
-        messagebox.showinfo("Default Path", f"Default path set to:\n{self.default_path}")
+            with run_metrics.phase("driver_start"):
+                self.driver = create_chrome_driver(self.headless_mode, self.scraper.browser_profile)
+            self.scraper.rate_limiter.wait(self.scraper.url)
+            self.driver.get(self.scraper.url)
+        return self.driver
 
-    def open_default_path(self):
-        if platform.system() == "Windows":
-            os.startfile(self.default_path)
-        elif platform.system() == "Darwin":
-            subprocess.Popen(["open", self.default_path])
-        else:
-            subprocess.Popen(["xdg-open", self.default_path])
+    def iter_pages(self, job, resume_from=None):
+        # In HTTP mode the browser is only started if a page actually needs it,
+        # and then kept for the worker's later fallbacks
+        if not self.scraper.http_mode:
+            self.warm_up()
+        with self.scraper.rate_limiter.slot(self.scraper.url):
+            try:
+                yield from self.scraper.iter_pages(
+                    job.search_term, job.max_pages, self.headless_mode, self.driver, job.start_page, resume_from, self.warm_up,
+                )
+            except Exception:
+                # A driver that errored mid-job may be in an unknown state; start fresh next time
+                self.quit_driver()
+                raise
 
-    def get_documents_path(self):
-        if platform.system() == "Windows":
-            return str(Path.home() / "Documents")
-        elif platform.system() == "Darwin":
-            return str(Path.home() / "Documents")
-        else:
-            return str(Path.home())
+    def close(self):
+        try:
+            self.quit_driver()
+        finally:
+            self.scraper.close()
 
-    def toggle_headless_mode(self):
-        self.headless_mode = not self.headless_mode
-        state = "enabled" if self.headless_mode else "disabled"
-        messagebox.showinfo("Headless Mode", f"Headless mode is now {state}.")
+    def quit_driver(self):
+        if self.driver is not None:
+            from browser import quit_chrome_driver
 
-    def start_scraping(self):
-        if self.scraping_active:
-            messagebox.showwarning("Warning", "Scraping is already in progress.")
-            return
+            try:
+                quit_chrome_driver(self.driver)
+            finally:
+                self.driver = None
 
-        if self.scraper is None:
-            messagebox.showwarning("Warning", "Please select a website first.")
-            return
+class ScrapeScheduler:
+    # Runs jobs across a fixed pool of persistent workers; every page batch is
+    # written to the shared sink as soon as it is extracted, then checkpointed.
+    # Setting stop_event makes the workers finish their current page and return;
+    # progress, if given, is called with (job, batch) after each batch is written.
+    # A deduplicator filters every batch before it reaches the sink; an enricher
+    # fills in detail fields on its own threads while the workers carry on.
+    def __init__(self, scraper_factory, workers=2, headless_mode=True, checkpoints=None, resume=False, stop_event=None, progress=None, deduplicator=None, enricher=None):
+        self.scraper_factory = scraper_factory
+        self.deduplicator = deduplicator
+        self.enricher = enricher
+        self.workers = workers
+        self.headless_mode = headless_mode
+        self.checkpoints = checkpoints
+        self.resume = resume
+        self.stop_event = stop_event or threading.Event()
+        self.progress = progress
 
-        search_term = self.search_entry.get().strip()
-        max_pages = self.max_pages_entry.get().strip()
-        if not max_pages.isdigit():
-            messagebox.showwarning("Warning", "Please enter a valid number of pages.")
-            return
+    def run(self, jobs, sink):
+        jobs = list(jobs)
+        job_queue = queue.Queue()
+        for job in jobs:
+            job_queue.put(job)
 
-        max_pages = int(max_pages)
-        output_file = self.output_file_entry.get().strip()
+        publisher = BatchPublisher(sink, self.checkpoints, self.resume, self.progress, self.deduplicator, self.enricher)
+        errors = []
 
-        if not output_file.endswith(".csv"):
-            messagebox.showwarning("Warning", "Output file must be a .csv file.")
-            return
+        def work():
+            worker = BrowserWorker(self.scraper_factory(), self.headless_mode)
+            try:
+                while not self.stop_event.is_set():
+                    try:
+                        job = job_queue.get_nowait()
+                    except queue.Empty:
+                        return
+                    try:
+                        checkpoint = publisher.resume_point(worker.scraper.site_key(), job)
+                        if publisher.already_done(job, checkpoint):
+                            continue
+                        with closing(worker.iter_pages(job, checkpoint)) as batches:
+                            page_started = time.perf_counter()
+                            for batch in batches:
+                                publisher.deliver(job, batch)
+                                run_metrics.observe("page", time.perf_counter() - page_started)
+                                if self.stop_event.is_set():
+                                    break
+                                page_started = time.perf_counter()
+                    except Exception as e:
+                        errors.append((job, e))
+            finally:
+                worker.close()
 
-        headless_mode = self.headless_mode
+        threads = [threading.Thread(target=work, daemon=True) for _ in range(min(self.workers, len(jobs)))]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+        except KeyboardInterrupt:
+            # Let the workers finish their current page so checkpoints stay consistent
+            self.stop_event.set()
+            for thread in threads:
+                thread.join()
+            publisher.join()
+            raise
 
-        self.scraping_active = True
-        self.progress_label.config(text="Scraping in progress...")
-        self.master.update_idletasks()
+        publisher.join()
+        if errors:
+            job, error = errors[0]
+            raise RuntimeError(f"Scraping '{job.search_term}' failed: {error}") from error
 
-        try:
-            data, max_page_reached = self.scraper.scrape_data(search_term, max_pages, headless_mode)
-            df = pd.DataFrame(data)
-            df.to_csv(os.path.join(self.default_path, output_file), index=False)
-            messagebox.showinfo("Success", f"Scraping completed! Data saved to {output_file}")
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
-        finally:
-            self.scraping_active = False
-            self.progress_label.config(text="")
+        return publisher.finished(jobs)
 
-    def stop_scraping(self):
-        if not self.scraping_active:
-            messagebox.showinfo("Info", "No active scraping process to stop.")
-            return
-        self.scraping_active = False
-        messagebox.showinfo("Stopped", "Scraping has been stopped.")
+def read_terms(path):
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m scrape",
+        description="Scrape business directory listings. Run without arguments (or with just --gui) to open the GUI.",
+    )
+    parser.add_argument("terms", nargs="*", help="search terms")
+    parser.add_argument("--site", default="yellowpages", help=f"one of {', '.join(available_sites())}, or the path of a site spec file")
+    parser.add_argument("--base-url", help="override the site's base URL (e.g. a mirror or a local test server)")
+    parser.add_argument("--terms-file", help="file with one search term per line")
+    parser.add_argument("--max-pages", type=int, default=sys.maxsize, help="last page to scrape (default: all pages)")
+    parser.add_argument("--start-page", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--engine", choices=["threads", "async"], default="threads",
+                        help="threads: worker pool with browser fallback; async: aiohttp crawler for HTTP-only sites")
+    parser.add_argument("--concurrency", type=int, default=16, help="search terms crawled at once by the async engine")
+    parser.add_argument("--per-host", type=int, default=4, help="requests in flight per host for the async engine")
+    parser.add_argument("--output", required=True, help="output file")
+    parser.add_argument("--format", choices=sorted(SINKS), help="output format (default: from the output file extension)")
+    parser.add_argument("--append", action="store_true", help="append to an existing CSV/JSON Lines output")
+    parser.add_argument("--normalize", action="store_true",
+                        help="add E.164 phone, registered domain, postal code and name key columns")
+    parser.add_argument("--browser", action="store_true", help="always drive Chrome instead of fetching pages over HTTP")
+    parser.add_argument("--show-browser", action="store_true", help="run Chrome with a visible window")
+    parser.add_argument("--browser-profile", choices=["lean", "full"], default="lean",
+                        help="lean: block heavy resources, eager page loads, bounded window (default); full: load pages like a normal browser")
+    parser.add_argument("--block", nargs="+", choices=sorted(BLOCKABLE_RESOURCES),
+                        help=f"resource types the lean profile blocks (default: {' '.join(LEAN_BLOCKED_RESOURCES)})")
+    parser.add_argument("--rate", type=float, default=0.4, help="requests per second per domain")
+    parser.add_argument("--politeness", help="JSON file with per-domain politeness policies")
+    parser.add_argument("--checkpoint-db", default=CHECKPOINT_FILENAME)
+    parser.add_argument("--resume", action="store_true", help="continue unfinished searches from their checkpoints (CSV or JSON Lines output)")
+    parser.add_argument("--cache-dir", help="directory for the persistent page cache")
+    parser.add_argument("--cache-ttl", type=float, default=24 * 3600, help="seconds before cached pages are revalidated")
+    parser.add_argument("--offline", action="store_true", help="serve pages from the cache only")
+    parser.add_argument("--dedup", action="store_true", help="drop businesses already emitted earlier in this run")
+    parser.add_argument("--dedup-db", help="SQLite index of businesses emitted by earlier runs; only new or changed ones are written")
+    parser.add_argument("--enrich", action="store_true", help="fill in missing fields from each listing's detail page")
+    parser.add_argument("--detail-workers", type=int, default=4, help="detail pages fetched at once")
+    parser.add_argument("--detail-rate", type=float, default=0.4, help="detail page requests per second per domain")
+    parser.add_argument("--detail-db", default=DETAILS_FILENAME, help="SQLite store of detail pages already looked up")
+    parser.add_argument("--report", help="write a JSON run report (timings, counters, selector hits) to this file")
+    parser.add_argument("--prometheus", help="write the run metrics in Prometheus text format to this file")
+    return parser
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv == ["--gui"]:
+        import gui
+
+        gui.main()
+        return 0
+
+    args = build_parser().parse_args(argv)
+    run_metrics.reset()
+    terms = list(args.terms)
+    if args.terms_file:
+        terms.extend(read_terms(args.terms_file))
+    if not terms:
+        print("No search terms given.", file=sys.stderr)
+        return 2
+    if args.offline and not args.cache_dir:
+        print("--offline needs --cache-dir.", file=sys.stderr)
+        return 2
+    if args.resume and sink_format(args.output, args.format) == "parquet":
+        print("--resume cannot continue a Parquet output; resume into CSV or JSON Lines instead.", file=sys.stderr)
+        return 2
+    if args.engine == "async" and (args.browser or args.cache_dir):
+        print("The async engine fetches over HTTP only and does not use the page cache.", file=sys.stderr)
+        return 2
+    try:
+        spec = load_spec_file(args.site) if os.path.isfile(args.site) else load_site_spec(args.site)
+    except (ValueError, KeyError) as e:
+        print(f"Invalid site {args.site}: {e}", file=sys.stderr)
+        return 2
+
+    if args.enrich and not spec.detail_link_column:
+        print(f"Site {spec.name} has no detail pages configured.", file=sys.stderr)
+        return 2
+
+    if args.politeness:
+        with open(args.politeness, encoding="utf-8") as f:
+            rate_limiter = DomainRateLimiter.from_config(json.load(f))
+    else:
+        # Concurrency is crawls per domain for the worker pool, requests in flight for the async engine
+        concurrency = args.per_host if args.engine == "async" else args.workers
+        rate_limiter = DomainRateLimiter(rate=args.rate, concurrency=max(concurrency, 1))
+    cache = PageCache(args.cache_dir, ttl=args.cache_ttl) if args.cache_dir else None
+    checkpoints = CheckpointStore(args.checkpoint_db)
+    dedup_index = DedupIndex(args.dedup_db) if args.dedup_db else None
+    deduplicator = Deduplicator(dedup_index) if args.dedup or dedup_index is not None else None
+    detail_store = DetailStore(args.detail_db) if args.enrich else None
+    enricher = None
+    if args.enrich:
+        detail_rate_limiter = DomainRateLimiter(rate=args.detail_rate, concurrency=args.detail_workers)
+        enricher = DetailEnricher(spec, args.detail_workers, detail_rate_limiter, cache, args.offline, detail_store)
 
-    def show_frame(self, frame_name):
-        frame = self.frames[frame_name]
-        frame.tkraise()
+    if args.browser_profile == "full":
+        browser_profile = BrowserProfile.full()
+    else:
+        browser_profile = BrowserProfile(block=args.block if args.block is not None else LEAN_BLOCKED_RESOURCES)
+
+    scraper_options = {"http_mode": not args.browser, "rate_limiter": rate_limiter, "cache": cache, "offline": args.offline, "browser_profile": browser_profile}
+    if not args.show_browser:
+        scraper_options["captcha_handler"] = refuse_captcha
+    if args.base_url:
+        scraper_options["url"] = args.base_url
+
+    def make_scraper():
+        return SiteScraper(spec=spec, **scraper_options)
+
+    def print_progress(job, batch):
+        print(f"{job.search_term}: page {batch.page_number}, {len(batch.records)} records", file=sys.stderr)
+
+    jobs = [ScrapeJob(term, args.max_pages, args.start_page) for term in terms]
+    try:
+        with open_sink(args.output, args.format, append=args.append or args.resume, normalize=args.normalize) as sink:
+            if args.engine == "async":
+                from crawler import AsyncCrawler
+
+                crawler = AsyncCrawler(spec, args.base_url, args.concurrency, args.per_host, rate_limiter=rate_limiter)
+                crawler.run(jobs, sink, checkpoints, args.resume, progress=print_progress, deduplicator=deduplicator, enricher=enricher)
+            else:
+                scheduler = ScrapeScheduler(make_scraper, args.workers, not args.show_browser, checkpoints, args.resume, progress=print_progress, deduplicator=deduplicator, enricher=enricher)
+                scheduler.run(jobs, sink)
+        summary = run_metrics.report()
+        print(
+            f"Wrote {sink.count} records to {args.output} "
+            f"({summary['pages']} pages in {summary['elapsed_seconds']:.1f}s, {summary['pages_per_second']:.2f} pages/s)",
+            file=sys.stderr,
+        )
+    except KeyboardInterrupt:
+        print("Interrupted; rerun with --resume to continue.", file=sys.stderr)
+        return 130
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if enricher is not None:
+            enricher.close()
+            detail_store.close()
+        checkpoints.close()
+        if cache is not None:
+            cache.close()
+        if dedup_index is not None:
+            dedup_index.close()
+        if args.report:
+            run_metrics.write_report(args.report)
+        if args.prometheus:
+            run_metrics.write_prometheus(args.prometheus)
+    return 0
 
 if __name__ == "__main__":
-    root = tk.Tk()
-    app = WebScraperGUI(root)
-    root.mainloop()
+    # Run through the importable module so gui.py, crawler.py and friends share
+    # this module's state (run_metrics, spec cache) instead of a second copy
+    import scrape
+
+    sys.exit(scrape.main())
@@ -0,0 +1,48 @@
+import os
+import sys
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+# The modules live next to this directory rather than in an installed package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    # Besides Last-Modified / If-Modified-Since, which SimpleHTTPRequestHandler
+    # already honours, sends an ETag (the file's mtime and size) and answers a
+    # matching If-None-Match with 304
+    etag = None
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            path = os.path.join(path, "index.html")
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            self.etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+            if self.headers.get("If-None-Match") == self.etag:
+                self.send_response(304)
+                self.end_headers()
+                return None
+        return super().send_head()
+
+    def end_headers(self):
+        if self.etag is not None:
+            self.send_header("ETag", self.etag)
+        super().end_headers()
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def fixture_server():
+    # Serves the saved pages under fixtures/ over HTTP; yields the base URL
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), partial(QuietHandler, directory=FIXTURES_DIR))
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/"
+    httpd.shutdown()
+    httpd.server_close()
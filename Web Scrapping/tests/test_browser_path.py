@@ -0,0 +1,107 @@
+import time
+import pytest
+import requests
+from lxml import html as lxml_html
+from lxml.cssselect import CSSSelector
+from selenium.webdriver.remote.webelement import WebElement
+import browser
+import scrape
+from browser import By, LISTING_SIGNATURE_SCRIPT, NoSuchElementException, StaleElementReferenceException
+from scrape import DomainRateLimiter, SiteScraper, is_hidden, load_site_spec
+
+class FakeElement(WebElement):
+    # Expected conditions only accept WebElement instances
+    def __init__(self, driver, node):
+        self.driver = driver
+        self.node = node
+        self.load = driver.load
+
+    def check(self):
+        self.driver.settle()
+        if self.load != self.driver.load:
+            raise StaleElementReferenceException("page reloaded")
+
+    def is_displayed(self):
+        self.check()
+        return not is_hidden(self.node)
+
+    def is_enabled(self):
+        self.check()
+        return True
+
+    def click(self):
+        self.check()
+        href = self.node.get("href")
+        if href:
+            # The next page arrives a little after the click, like a real navigation
+            self.driver.pending = (href, time.monotonic() + 0.3)
+        else:
+            self.node.set("hidden", "")
+
+    def send_keys(self, *keys):
+        pass
+
+class FakeDriver:
+    # Just enough of a WebDriver to run the browser path against the fixture
+    # server: CSS lookups and visibility come from the static HTML
+    def __init__(self):
+        self.load = 0
+        self.pending = None
+
+    def get(self, url):
+        response = requests.get(url)
+        response.encoding = "utf-8"
+        self.current_url = response.url
+        self.page_source = response.text
+        self.document = lxml_html.fromstring(self.page_source)
+        self.document.make_links_absolute(self.current_url)
+        self.load += 1
+        self.pending = None
+
+    def refresh(self):
+        self.get(self.current_url)
+
+    def settle(self):
+        if self.pending and time.monotonic() >= self.pending[1]:
+            self.get(self.pending[0])
+
+    def find_elements(self, by, selector):
+        assert by == By.CSS_SELECTOR
+        self.settle()
+        return [FakeElement(self, node) for node in CSSSelector(selector)(self.document)]
+
+    def find_element(self, by, selector):
+        elements = self.find_elements(by, selector)
+        if not elements:
+            raise NoSuchElementException(selector)
+        return elements[0]
+
+    def execute_script(self, script, *args):
+        self.settle()
+        if script == LISTING_SIGNATURE_SCRIPT:
+            listings = CSSSelector(args[0])(self.document)
+            if not listings:
+                return ""
+            return f"{len(listings)}|{listings[0].text_content()}|{listings[-1].text_content()}"
+        return None
+
+def test_hidden_captcha_does_not_end_the_wait_for_the_next_page(fixture_server):
+    # Both fixture pages carry a hidden CAPTCHA container
+    url = fixture_server + "yellowpages/results/"
+    scraper = SiteScraper(spec=load_site_spec("yellowpages"), url=url, http_mode=False, rate_limiter=DomainRateLimiter(rate=1000, capacity=1000))
+    scraper.captcha_handler = lambda: pytest.fail("no CAPTCHA is shown")
+    batches = list(scraper.iter_pages_browser("cafe", 10, True, FakeDriver(), start_url=url))
+
+    assert [batch.page_number for batch in batches] == [1, 2]
+    assert [record["Name"] for record in batches[1].records] == ["Latte Lab", "Drip & Co"]
+
+def test_headless_cli_fails_on_a_captcha(fixture_server, tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(browser, "create_chrome_driver", lambda headless_mode, profile=None: FakeDriver())
+    monkeypatch.setattr(browser, "quit_chrome_driver", lambda driver: None)
+    status = scrape.main([
+        "cafe", "--base-url", fixture_server + "yellowpages/captcha/", "--rate", "1000",
+        "--output", str(tmp_path / "out.csv"), "--checkpoint-db", str(tmp_path / "checkpoints.sqlite3"),
+    ])
+
+    assert status == 1
+    assert "rerun with --show-browser --resume" in capsys.readouterr().err
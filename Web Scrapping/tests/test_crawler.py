@@ -0,0 +1,134 @@
+import time
+import asyncio
+import threading
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+from aiohttp import web
+from crawler import AsyncCrawler
+from scrape import CheckpointStore, DomainRateLimiter, ScrapeJob, SiteSpec, Sink, load_site_spec, run_metrics
+
+class StubSite:
+    # aiohttp stub of a Yellow Pages results site: ?s=<term>&page=<n> serves
+    # `pages` pages of two listings each. Terms in `unavailable` answer 503 once
+    # per page, terms in `scripted` serve a page without listings.
+    def __init__(self, pages=3, unavailable=(), scripted=()):
+        self.pages = pages
+        self.unavailable = set(unavailable)
+        self.scripted = set(scripted)
+        self.failed = set()
+        self.requested_at = []
+
+    async def results(self, request):
+        self.requested_at.append(time.monotonic())
+        term = request.query.get("s", "")
+        page = int(request.query.get("page", "1"))
+        if term in self.unavailable and (term, page) not in self.failed:
+            self.failed.add((term, page))
+            return web.Response(status=503)
+        if term in self.scripted:
+            return web.Response(text="<html><body><main id='results'></main></body></html>", content_type="text/html")
+        listings = "".join(
+            f"<div class='listing'><h2>{term} {page}-{index}</h2><a class='phone' href='tel:6{page}{index}00000'></a></div>"
+            for index in range(2)
+        )
+        pager = f"<a class='next' href='?s={term}&page={page + 1}'>Next</a>" if page < self.pages else ""
+        return web.Response(text=f"<html><body><main>{listings}</main>{pager}</body></html>", content_type="text/html")
+
+class ThreadedSink(Sink):
+    def __init__(self):
+        self.records = []
+        self.threads = set()
+        self.count = 0
+
+    def write(self, records):
+        self.threads.add(threading.current_thread().name)
+        self.records.extend(records)
+        self.count += len(records)
+
+@pytest.fixture
+def stub_site():
+    # Runs the stub on its own event loop in a thread; the crawler brings its own loop
+    site = StubSite()
+    app = web.Application()
+    app.router.add_get("/", site.results)
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+    server = web.TCPSite(runner, "127.0.0.1", 0)
+    loop.run_until_complete(server.start())
+    site.url = f"http://127.0.0.1:{runner.addresses[0][1]}/"
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield site
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.run_until_complete(runner.cleanup())
+    loop.close()
+
+def crawl(site, terms, rate=1000.0, capacity=1000, spec=None, start_page=1, checkpoints=None, resume=False):
+    crawler = AsyncCrawler(
+        spec or load_site_spec("yellowpages"), site.url, parse_workers=1, backoff=0.01, user_agent="test",
+        rate_limiter=DomainRateLimiter(rate=rate, capacity=capacity, concurrency=4),
+    )
+    sink = ThreadedSink()
+    finished = crawler.run([ScrapeJob(term, 10, start_page) for term in terms], sink, checkpoints, resume)
+    return finished, sink
+
+def test_all_pages_are_crawled(stub_site):
+    finished, sink = crawl(stub_site, ["cafe", "bakery"])
+
+    assert finished
+    names = [record["Name"] for record in sink.records]
+    assert sorted(names) == sorted(f"{term} {page}-{index}" for term in ["cafe", "bakery"] for page in (1, 2, 3) for index in (0, 1))
+    # Pages of one term reach the sink in order
+    assert [name for name in names if name.startswith("cafe")] == [f"cafe {page}-{index}" for page in (1, 2, 3) for index in (0, 1)]
+    assert sink.records[0]["Phone"] == "61000000"
+
+def test_sink_writes_run_off_the_event_loop(stub_site):
+    _, sink = crawl(stub_site, ["cafe", "bakery"])
+
+    assert len(sink.threads) == 1
+    assert next(iter(sink.threads)).startswith("sink")
+
+def test_rate_limit_spaces_requests(stub_site):
+    crawl(stub_site, ["cafe", "bakery"], rate=10.0, capacity=1)
+
+    gaps = [later - earlier for earlier, later in zip(stub_site.requested_at, stub_site.requested_at[1:])]
+    assert len(stub_site.requested_at) == 6
+    assert min(gaps) >= 0.08
+
+def test_unavailable_pages_are_retried(stub_site):
+    stub_site.unavailable.add("cafe")
+    run_metrics.reset()
+    finished, sink = crawl(stub_site, ["cafe"])
+
+    assert finished
+    assert len(sink.records) == 6
+    assert run_metrics.report()["counters"]["retries"] == 3
+
+def test_pages_needing_a_browser_fail_the_run(stub_site):
+    stub_site.scripted.add("cafe")
+    with pytest.raises(RuntimeError, match="Browser required"):
+        crawl(stub_site, ["cafe"])
+
+def test_page_url_template_skips_earlier_pages(stub_site):
+    spec = SiteSpec(dict(load_site_spec("yellowpages").config, page_url="{base_url}?s={query}&page={page}"))
+    finished, sink = crawl(stub_site, ["cafe"], spec=spec, start_page=3)
+
+    assert finished
+    assert [record["Name"] for record in sink.records] == ["cafe 3-0", "cafe 3-1"]
+    assert len(stub_site.requested_at) == 1
+
+def test_finished_terms_are_not_crawled_again_on_resume(stub_site, tmp_path):
+    checkpoints = CheckpointStore(str(tmp_path / "checkpoints.sqlite3"))
+    try:
+        crawl(stub_site, ["cafe"], checkpoints=checkpoints)
+        assert checkpoints.load(stub_site.url.split("/")[2], "cafe").records_emitted == 6
+
+        finished, sink = crawl(stub_site, ["cafe"], checkpoints=checkpoints, resume=True)
+        assert finished
+        assert sink.records == []
+        assert len(stub_site.requested_at) == 3
+    finally:
+        checkpoints.close()
@@ -0,0 +1,58 @@
+from urllib.parse import urlparse
+import pytest
+from scrape import (
+    CheckpointStore,
+    DedupIndex,
+    Deduplicator,
+    DomainRateLimiter,
+    ScrapeJob,
+    ScrapeScheduler,
+    SiteScraper,
+    Sink,
+    load_site_spec,
+)
+
+class ListSink(Sink):
+    def __init__(self, fail_on_page=None):
+        self.records = []
+        self.pages = 0
+        self.fail_on_page = fail_on_page
+        self.count = 0
+
+    def write(self, records):
+        self.pages += 1
+        if self.pages == self.fail_on_page:
+            raise OSError("disk full")
+        self.records.extend(records)
+        self.count += len(records)
+
+def run(url, sink, checkpoints, index, resume):
+    def make_scraper():
+        return SiteScraper(spec=load_site_spec("yellowpages"), url=url, rate_limiter=DomainRateLimiter(rate=1000, capacity=1000))
+
+    scheduler = ScrapeScheduler(make_scraper, 1, checkpoints=checkpoints, resume=resume, deduplicator=Deduplicator(index))
+    return scheduler.run([ScrapeJob("cafe", 10)], sink)
+
+def test_failed_write_does_not_mark_records_as_emitted(fixture_server, tmp_path):
+    url = fixture_server + "yellowpages/results/"
+    checkpoints = CheckpointStore(str(tmp_path / "checkpoints.sqlite3"))
+    index = DedupIndex(str(tmp_path / "dedup.sqlite3"))
+    try:
+        failing = ListSink(fail_on_page=2)
+        with pytest.raises(RuntimeError):
+            run(url, failing, checkpoints, index, resume=False)
+        resumed = ListSink()
+        assert run(url, resumed, checkpoints, index, resume=True)
+
+        names = [record["Name"] for record in failing.records + resumed.records]
+        assert names == ["Kopi Corner Pte Ltd", "Bean There Cafe", "Morning Brew Café 美食", "Latte Lab", "Drip & Co"]
+        # Counted from what reached the sink, across both runs
+        assert checkpoints.load(urlparse(url).netloc, "cafe").records_emitted == 5
+
+        # A later run finds every business in the index, unchanged
+        again = ListSink()
+        run(url, again, checkpoints, index, resume=False)
+        assert again.records == []
+    finally:
+        checkpoints.close()
+        index.close()
@@ -0,0 +1,120 @@
+import json
+import time
+import uuid
+import threading
+import pytest
+import distributed
+from benchmark import MockDirectoryServer
+from distributed import SqliteWorkQueue, job_payloads, open_queue
+from scrape import SiteSpec, load_site_spec
+
+@pytest.fixture
+def redis_url():
+    # fakeredis speaking the Redis protocol on a local port, as a stand-in for a real server
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("redis")
+    server = fakeredis.TcpFakeServer(("127.0.0.1", 0))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"redis://127.0.0.1:{server.server_address[1]}/0"
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture(params=["sqlite", "redis"])
+def queue_location(request, tmp_path):
+    if request.param == "sqlite":
+        return str(tmp_path / "queue.sqlite3")
+    return request.getfixturevalue("redis_url")
+
+@pytest.fixture
+def work_queue(queue_location):
+    queue = open_queue(queue_location, f"test-{uuid.uuid4().hex}")
+    yield queue
+    queue.close()
+
+def test_jobs_are_leased_in_order_and_completed(work_queue):
+    work_queue.put([{"term": "cafe"}, {"term": "bakery"}])
+
+    first = work_queue.lease("a", 60, 3)
+    second = work_queue.lease("b", 60, 3)
+    assert (first.payload, first.attempt) == ({"term": "cafe"}, 1)
+    assert second.payload == {"term": "bakery"}
+    assert work_queue.lease("c", 60, 3) is None
+
+    assert work_queue.complete(second, "part-2.jsonl")
+    assert work_queue.stats() == {"pending": 0, "leased": 1, "done": 1, "failed": 0}
+    assert work_queue.complete(first, "part-1.jsonl")
+    assert work_queue.results() == [(first.id, "part-1.jsonl"), (second.id, "part-2.jsonl")]
+
+def test_expired_lease_is_requeued_and_the_stale_worker_is_fenced_off(work_queue):
+    work_queue.put([{"term": "cafe"}])
+    stale = work_queue.lease("dead", 0.2, 3)
+    time.sleep(0.4)
+
+    task = work_queue.lease("alive", 60, 3)
+    assert (task.id, task.attempt) == (stale.id, 2)
+    assert not work_queue.heartbeat(stale, 60)
+    assert not work_queue.complete(stale, "stale.jsonl")
+    assert work_queue.complete(task, "fresh.jsonl")
+    assert work_queue.results() == [(task.id, "fresh.jsonl")]
+
+def test_heartbeats_keep_the_lease(work_queue):
+    work_queue.put([{"term": "cafe"}])
+    task = work_queue.lease("a", 0.3, 3)
+    for _ in range(3):
+        time.sleep(0.15)
+        assert work_queue.heartbeat(task, 0.3)
+
+    assert work_queue.lease("b", 60, 3) is None
+    assert work_queue.complete(task, "part.jsonl")
+
+def test_failed_jobs_are_retried_until_max_attempts(work_queue):
+    work_queue.put([{"term": "cafe"}])
+    for attempt in (1, 2):
+        task = work_queue.lease("a", 60, 2)
+        assert task.attempt == attempt
+        assert work_queue.fail(task, "HTTPError: 503", 2)
+
+    assert work_queue.lease("a", 60, 2) is None
+    assert work_queue.stats()["failed"] == 1
+    assert work_queue.failures() == [(task.id, "HTTPError: 503")]
+
+def test_job_payloads_split_page_ranges():
+    payloads = job_payloads("yellowpages", ["cafe"], 25, 10)
+    assert [(payload["start_page"], payload["max_pages"]) for payload in payloads] == [(1, 10), (11, 20), (21, 25)]
+
+def test_sqlite_queue_is_shared_by_connections(tmp_path):
+    path = str(tmp_path / "queue.sqlite3")
+    coordinator, worker = SqliteWorkQueue(path), SqliteWorkQueue(path)
+    try:
+        coordinator.put([{"term": "cafe"}])
+        task = worker.lease("a", 60, 3)
+        assert worker.complete(task, "part.jsonl")
+        assert coordinator.stats()["done"] == 1
+    finally:
+        coordinator.close()
+        worker.close()
+
+def test_worker_processes_crawl_and_merge(queue_location, tmp_path):
+    # Two terms of 6 pages in 2-page jobs across 3 worker processes; with a page
+    # URL template every page is fetched exactly once
+    config = dict(load_site_spec("yellowpages").config, page_url="{base_url}?s={query}&page={page}")
+    site = tmp_path / "site.json"
+    site.write_text(json.dumps(config), encoding="utf-8")
+    parts = str(tmp_path / "parts")
+    output = tmp_path / "listings.jsonl"
+    common = ["--queue-name", f"test-{uuid.uuid4().hex}"]
+
+    with MockDirectoryServer(SiteSpec(config), pages=6, listings=5, cookie_notice=False) as server:
+        assert distributed.main(common + ["submit", "--queue", queue_location, "--site", str(site), "--base-url", server.url,
+                                          "--max-pages", "6", "--pages-per-job", "2", "cafe", "bakery"]) == 0
+        assert distributed.main(common + ["work", "--queue", queue_location, "--output-dir", parts,
+                                          "--processes", "3", "--rate", "1000"]) == 0
+        assert server.requests == 12
+
+    assert distributed.main(common + ["merge", "--queue", queue_location, "--output-dir", parts, "--output", str(output)]) == 0
+    records = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    assert len(records) == 60
+    assert len({record["Name"] for record in records}) == 60
+    # Partitions are merged in job order: all of "cafe", page by page, then "bakery"
+    assert records[0]["Name"].startswith("Cafe") and records[-1]["Name"].startswith("Bakery")
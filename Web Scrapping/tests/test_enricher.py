@@ -0,0 +1,30 @@
+from scrape import DetailEnricher, DomainRateLimiter, PageBatch, load_site_spec, run_metrics
+
+def enrich(batches):
+    enricher = DetailEnricher(load_site_spec("yellowpages"), rate_limiter=DomainRateLimiter(rate=1000, capacity=1000))
+    published = []
+    try:
+        for batch in batches:
+            enricher.submit(batch, lambda batch=batch: published.append(batch.page_number))
+        enricher.join()
+        # Finished lookups are not kept around
+        assert not enricher.in_flight
+    finally:
+        enricher.close()
+    return published
+
+def test_missing_fields_come_from_the_detail_page(fixture_server):
+    record = {"Name": "Bean There Cafe", "Phone": "", "Email": "", "Detail URL": fixture_server + "yellowpages/detail/bean-there.html"}
+    assert enrich([PageBatch(1, fixture_server, [record], False)]) == [1]
+    assert record["Phone"] == "6234 5678"
+    assert record["Email"] == "hi@beanthere.sg"
+
+def test_unparsable_detail_page_does_not_stop_the_run(fixture_server):
+    run_metrics.reset()
+    broken = {"Name": "Kopi Corner", "Detail URL": fixture_server + "yellowpages/detail/empty.html"}
+    fine = {"Name": "Bean There Cafe", "Detail URL": fixture_server + "yellowpages/detail/bean-there.html"}
+
+    assert enrich([PageBatch(1, fixture_server, [broken], True), PageBatch(2, fixture_server, [fine], False)]) == [1, 2]
+    assert "Phone" not in broken
+    assert fine["Phone"] == "6234 5678"
+    assert run_metrics.report()["counters"]["detail_errors"] == 1
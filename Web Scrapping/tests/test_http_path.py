@@ -0,0 +1,94 @@
+import pytest
+import browser
+from scrape import BrowserRequired, BrowserWorker, DomainRateLimiter, ScrapeJob, SiteScraper, SiteSpec, load_site_spec, run_metrics
+
+def make_scraper(url, spec=None):
+    return SiteScraper(spec=spec or load_site_spec("yellowpages"), url=url, rate_limiter=DomainRateLimiter(rate=1000, capacity=1000))
+
+def test_pages_are_scraped_over_http(fixture_server):
+    scraper = make_scraper(fixture_server + "yellowpages/results/")
+    batches = list(scraper.iter_pages_http("cafe", 10))
+
+    assert [batch.page_number for batch in batches] == [1, 2]
+    assert [batch.has_next for batch in batches] == [True, False]
+    first, second = batches[0].records, batches[1].records
+    assert [record["Name"] for record in first] == ["Kopi Corner Pte Ltd", "Bean There Cafe", "Morning Brew Café 美食"]
+    assert first[0]["Phone"] == "6789 1234"
+    assert first[0]["Email"] == "hello@kopicorner.com.sg"
+    assert first[0]["Detail URL"] == fixture_server + "detail/kopi-corner/"
+    # Empty phone link falls back to its tel: href
+    assert first[1]["Phone"] == "62345678"
+    assert first[1]["Address"] == "1 Jurong West Central 2, #01-23, Singapore 648886"
+    assert first[2]["Phone"] == "6444 5566"
+    assert second[0]["Email"] == "team@lattelab.sg"
+    assert second[1]["Name"] == "Drip & Co"
+
+def test_pages_before_start_page_are_not_extracted(fixture_server):
+    scraper = make_scraper(fixture_server + "yellowpages/results/")
+    batches = list(scraper.iter_pages_http("cafe", 10, start_page=2))
+
+    assert [batch.page_number for batch in batches] == [2]
+    assert len(batches[0].records) == 2
+
+def test_page_url_template_skips_earlier_pages(fixture_server):
+    spec = SiteSpec(dict(load_site_spec("yellowpages").config, page_url="{base_url}page{page}.html"))
+    scraper = make_scraper(fixture_server + "yellowpages/results/", spec)
+    run_metrics.reset()
+    batches = list(scraper.iter_pages("cafe", 10, headless_mode=True, start_page=2))
+
+    assert [batch.page_number for batch in batches] == [2]
+    assert [record["Name"] for record in batches[0].records] == ["Latte Lab", "Drip & Co"]
+    assert run_metrics.report()["counters"]["requests"] == 1
+
+def test_max_pages_stops_pagination(fixture_server):
+    scraper = make_scraper(fixture_server + "yellowpages/results/")
+    batches = list(scraper.iter_pages_http("cafe", 1))
+
+    assert [batch.page_number for batch in batches] == [1]
+    assert batches[0].has_next
+
+@pytest.mark.parametrize("page", ["captcha", "scripted"])
+def test_browser_required(fixture_server, page):
+    scraper = make_scraper(fixture_server + f"yellowpages/{page}/")
+    with pytest.raises(BrowserRequired) as raised:
+        list(scraper.iter_pages_http("cafe", 10))
+    assert raised.value.page_count == 0
+
+@pytest.mark.parametrize("markup, needed", [
+    ('<div class="captcha"></div><div class="listing"></div>', True),
+    ('<div class="captcha" hidden></div><div class="listing"></div>', False),
+    ('<div style="display: none"><div class="captcha"></div></div><div class="listing"></div>', False),
+    ('<div class="captcha" style="visibility:hidden"></div>', True),
+    ('<div class="listing"></div>', False),
+])
+def test_needs_browser(markup, needed):
+    spec = load_site_spec("yellowpages")
+    document = spec.extractor.parse(f"<html><body>{markup}</body></html>")
+    assert spec.needs_browser(document) is needed
+
+class FakeDriver:
+    def get(self, url):
+        pass
+
+def test_browser_fallbacks_share_the_workers_chrome(fixture_server, monkeypatch):
+    started, quit = [], []
+    monkeypatch.setattr(browser, "create_chrome_driver", lambda headless_mode, profile=None: started.append(FakeDriver()) or started[-1])
+    monkeypatch.setattr(browser, "quit_chrome_driver", quit.append)
+    scraper = make_scraper(fixture_server + "yellowpages/captcha/")
+    drivers = []
+
+    def iter_pages_browser(search_term, max_pages, headless_mode, driver=None, start_page=1, start_url=None, page_count=0):
+        drivers.append(driver)
+        return iter(())
+
+    scraper.iter_pages_browser = iter_pages_browser
+    worker = BrowserWorker(scraper, headless_mode=True)
+    for term in ("cafe", "bakery"):
+        list(worker.iter_pages(ScrapeJob(term, 10)))
+    assert scraper.fetcher is not None
+    worker.close()
+
+    assert len(started) == 1
+    assert drivers == [started[0], started[0]]
+    assert quit == started
+    assert scraper.fetcher is None
@@ -0,0 +1,33 @@
+import pytest
+from scrape import Deduplicator, dedup_keys, fold_text, normalize_record
+
+pa = pytest.importorskip("pyarrow")
+from normalize import normalize_table
+
+def test_fold_text_keeps_non_ascii_letters():
+    assert fold_text("美食 Trading") == "美食 trading"
+    assert fold_text("  Café Kopi-O_Bar ") == "café kopi o bar"
+    assert fold_text("STRASSE") == fold_text("Straße")
+    assert fold_text(None) == ""
+
+def test_names_differing_only_in_non_ascii_letters_are_kept_apart():
+    first = {"Name": "美食 Trading", "Address": "1 Fusionopolis Way, Singapore 138632"}
+    second = {"Name": "海鲜 Trading", "Address": "1 Fusionopolis Way, Singapore 138632"}
+
+    assert dedup_keys(first) != dedup_keys(second)
+    kept, _ = Deduplicator().filter([first, second])
+    assert kept == [first, second]
+
+@pytest.mark.parametrize("record", [
+    {"Name": "Kopi Corner Pte Ltd", "Phone": "0065 6789 1234", "Website": "https://www.kopicorner.com.sg/", "Email": "hello@kopicorner.com.sg"},
+    {"Name": "Bean There", "Phone": "+65 6234-5678 / 9123 4567", "Website": "https://shop.Example.COM.SG/about"},
+    {"Name": "Hotline", "Phone": "1800 123 4567", "Website": "www.example.co.uk"},
+    {"Name": "Overseas", "Phone": "+44 20 7946 0958", "Website": "http://203.0.113.7:8080/menu"},
+    {"Name": "Not a number", "Phone": "Call us", "Website": "mailto:info@example.sg"},
+    {"Name": "Morning Brew Café 美食", "Address": "50 Bedok North Road, Singapore 460050", "Email": "  Hello@MorningBrew.SG "},
+    {"Name": "海鲜 Trading", "Address": "Blk 123 #01-45 S(520123)", "Email": ""},
+    {"Name": None, "Phone": None, "Website": None, "Address": None, "Email": None},
+    {"Name": "Missing columns"},
+])
+def test_record_and_table_normalization_agree(record):
+    assert normalize_table(pa.Table.from_pylist([record])).to_pylist() == [normalize_record(record)]
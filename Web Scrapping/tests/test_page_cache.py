@@ -0,0 +1,100 @@
+import os
+import time
+import pytest
+from scrape import CachedPage, HttpFetcher, PageCache, PageNotCached, run_metrics
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = PageCache(str(tmp_path / "cache"))
+    yield cache
+    cache.close()
+
+def fetch(cache, url, offline=False):
+    fetcher = HttpFetcher(user_agent="test", cache=cache, offline=offline)
+    try:
+        return fetcher.get(url)
+    finally:
+        fetcher.close()
+
+def blobs(cache):
+    return sorted(name for _, _, names in os.walk(cache.directory) for name in names if name.endswith(".html"))
+
+def test_fresh_pages_are_served_until_the_ttl_expires(fixture_server, cache):
+    url = fixture_server + "yellowpages/results/page2.html"
+    cache.ttl = 0.3
+    run_metrics.reset()
+    first = fetch(cache, url)
+    second = fetch(cache, url)
+    time.sleep(0.4)
+    third = fetch(cache, url)
+
+    assert (first.from_cache, second.from_cache, third.from_cache) == (False, True, True)
+    assert second.text == first.text
+    counters = run_metrics.report()["counters"]
+    assert counters["requests"] == 2
+    assert counters["cache_hits"] == 1
+    assert counters["cache_revalidated"] == 1
+
+@pytest.mark.parametrize("validator", ["etag", "last_modified"])
+def test_stale_pages_are_revalidated(fixture_server, cache, validator):
+    url = fixture_server + "yellowpages/results/page2.html"
+    page = fetch(cache, url)
+    assert page.etag and page.last_modified
+    # Keep only one validator, so the server answers 304 to exactly that header
+    validators = {"etag": None, "last_modified": None, validator: getattr(page, validator)}
+    cache.store(url, CachedPage(page.url, "cached copy", **validators))
+    cache.ttl = 0
+    run_metrics.reset()
+    revalidated = fetch(cache, url)
+
+    assert revalidated.from_cache
+    assert revalidated.text == "cached copy"
+    assert run_metrics.report()["counters"]["cache_revalidated"] == 1
+
+def test_changed_pages_are_fetched_again(fixture_server, cache):
+    url = fixture_server + "yellowpages/results/page2.html"
+    cache.store(url, CachedPage(url, "old copy", etag='"outdated"', last_modified="Thu, 01 Jan 1970 00:00:00 GMT"))
+    cache.ttl = 0
+    page = fetch(cache, url)
+
+    assert not page.from_cache
+    assert "Latte Lab" in page.text
+    assert cache.lookup(url).text == page.text
+
+def test_least_recently_used_pages_are_evicted(cache):
+    cache.max_bytes = 25
+    for name in ("a", "b"):
+        cache.store(name, CachedPage(name, name * 10))
+        time.sleep(0.01)
+    cache.lookup("a")
+    time.sleep(0.01)
+    cache.store("c", CachedPage("c", "c" * 10))
+
+    assert cache.lookup("b") is None
+    assert cache.lookup("a").text == "a" * 10
+    assert cache.lookup("c").text == "c" * 10
+    assert len(blobs(cache)) == 2
+
+def test_unreferenced_bodies_are_removed(cache):
+    # Two URLs with the same body share one blob until neither refers to it
+    cache.store("a", CachedPage("a", "same body"))
+    cache.store("b", CachedPage("b", "same body"))
+    assert len(blobs(cache)) == 1
+
+    cache.store("a", CachedPage("a", "new body"))
+    assert len(blobs(cache)) == 2
+    cache.discard("b")
+    assert len(blobs(cache)) == 1
+    assert cache.lookup("b") is None
+    assert cache.lookup("a").text == "new body"
+
+def test_offline_mode_serves_stale_pages_and_never_fetches(fixture_server, cache):
+    url = fixture_server + "yellowpages/results/page2.html"
+    cache.store(url, CachedPage(url, "cached copy"))
+    cache.ttl = 0
+    run_metrics.reset()
+
+    assert fetch(cache, url, offline=True).text == "cached copy"
+    with pytest.raises(PageNotCached):
+        fetch(cache, fixture_server + "yellowpages/results/", offline=True)
+    assert "requests" not in run_metrics.report()["counters"]
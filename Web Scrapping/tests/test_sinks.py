@@ -0,0 +1,65 @@
+import csv
+import pytest
+from scrape import ColumnBuffer, CsvSink, DataFrameSink, ParquetSink
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+def listings(count, start=0, email=True):
+    return [
+        {"Name": f"Cafe {index}", "Area": "Tampines", "Email": f"cafe{index}@example.sg" if email else None}
+        for index in range(start, start + count)
+    ]
+
+def test_parquet_row_groups_are_split_at_row_group_size(tmp_path):
+    path = str(tmp_path / "listings.parquet")
+    with ParquetSink(path, row_group_size=2) as sink:
+        sink.write(listings(3))
+        sink.write(listings(2, 3))
+
+    parquet = pq.ParquetFile(path)
+    assert parquet.metadata.num_rows == 5
+    assert [parquet.metadata.row_group(index).num_rows for index in range(parquet.num_row_groups)] == [2, 1, 2]
+    assert parquet.read().column("Name").to_pylist() == [f"Cafe {index}" for index in range(5)]
+
+def test_parquet_column_empty_in_the_first_row_group(tmp_path):
+    path = str(tmp_path / "listings.parquet")
+    with ParquetSink(path, row_group_size=2) as sink:
+        sink.write(listings(2, email=False))
+        sink.write(listings(2, 2))
+
+    emails = pq.read_table(path).column("Email").to_pylist()
+    assert emails == [None, None, "cafe2@example.sg", "cafe3@example.sg"]
+
+def test_column_buffer_stops_interning_mostly_unique_columns():
+    buffer = ColumnBuffer(intern_sample=10)
+    # Built strings, so equal values start out as distinct objects
+    buffer.append({"Name": "".join(["Cafe ", str(index)]), "Area": "".join(["Tamp", "ines"])} for index in range(20))
+
+    assert buffer.interned["Name"] is None
+    assert len(buffer.interned["Area"]) == 1
+    areas = buffer.columns["Area"]
+    assert all(area is areas[0] for area in areas)
+    assert len(buffer) == 20
+
+def test_dataframe_sink_builds_one_frame_from_its_chunks():
+    sink = DataFrameSink(chunk_size=2, normalize=True)
+    sink.write(listings(3, email=False))
+    sink.write(listings(2, 3))
+    frame = sink.dataframe()
+
+    assert len(frame) == 5
+    assert list(frame["Name"]) == [f"Cafe {index}" for index in range(5)]
+    assert list(frame["Name Key"])[:2] == ["cafe 0", "cafe 1"]
+    assert frame["Email"].tolist()[3] == "cafe3@example.sg"
+
+def test_csv_header_is_written_once_when_appending(tmp_path):
+    path = str(tmp_path / "listings.csv")
+    with CsvSink(path) as sink:
+        sink.write(listings(2))
+    with CsvSink(path, append=True) as sink:
+        sink.write(listings(1, 2))
+
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ["Name", "Area", "Email"]
+    assert [row[0] for row in rows[1:]] == ["Cafe 0", "Cafe 1", "Cafe 2"]